@@ -3,7 +3,12 @@ set -euo pipefail
 
 ZIP_NAME="my_deployment_package.zip"
 PKG_DIR="package"
-FILES_TO_ADD=("lambda_function.py")
+# Source files and where they go in the package. similarity_index.py is shared
+# with the backend and keeps its services/ path, so the import is the same in both.
+SOURCES=(
+  "lambda_function.py:lambda_function.py"
+  "../backend/services/similarity_index.py:services/similarity_index.py"
+)
 
 echo "Cleaning old build..."
 rm -f "$ZIP_NAME"
@@ -16,14 +21,17 @@ docker run --rm --platform linux/arm64 \
   public.ecr.aws/lambda/python:3.13 \
   -c "pip install --no-cache-dir -r requirements.txt -t $PKG_DIR/"
 
-echo "Zipping dependencies..."
-( cd "$PKG_DIR" && zip -r9 "../$ZIP_NAME" . -x '*.DS_Store' >/dev/null )
-
 echo "Adding source files..."
-for f in "${FILES_TO_ADD[@]}"; do
-  [[ -f $f ]] && zip -g "$ZIP_NAME" "$f" >/dev/null || echo "⚠️  Skipping missing file: $f"
+for entry in "${SOURCES[@]}"; do
+  src="${entry%%:*}"
+  dest="$PKG_DIR/${entry#*:}"
+  mkdir -p "$(dirname "$dest")"
+  cp "$src" "$dest"
 done
 
+echo "Zipping package..."
+( cd "$PKG_DIR" && zip -r9 "../$ZIP_NAME" . -x '*.DS_Store' >/dev/null )
+
 echo "Verifying pydantic_core architecture..."
 find "$PKG_DIR" -name '*pydantic_core*.so' -exec file {} \; || echo "⚠️  pydantic_core .so not found!"
 
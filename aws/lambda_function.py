@@ -1,4 +1,7 @@
 import os
+import argparse
+from datetime import datetime, timezone
+import numpy as np
 from supabase import create_client
 
 # Load .env locally, skip in Lambda
@@ -11,53 +14,184 @@ SUPABASE_URL = os.environ["SUPABASE_URL"]
 SUPABASE_KEY = os.environ["SUPABASE_KEY"]
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def get_similar_users_rpc(embedding: list, user_id: str, top_n: int = 10):
-    # Flatten if nested
-    if isinstance(embedding[0], list):
-        embedding = embedding[0]
-    try:     
-        response = supabase.rpc(
-            "get_similar_users",
-            {
-                "input_embedding": embedding,
-                "current_user_id": user_id,
-                "n": top_n
-            }
-        ).execute()
-        return [row["user_id"] for row in response.data]
-    except Exception as e:
-        print("Exception during Supabase RPC:", e)
-        return []
-
-def update_all_recommendations():
+# Optional: the backend's Redis, so refreshed users' cached /people pages are dropped
+REDIS_URL = os.getenv("REDIS_URL")
+# Must match recommendations_cache and people_versions in backend/cache.py
+RECOMMENDATIONS_CACHE_PREFIX = "cache:recs:"
+PEOPLE_VERSION_PREFIX = "ver:people:"
+
+# Shared with the backend. The build script packages it as services/similarity_index.py;
+# to run this file locally, put backend/ on the path: PYTHONPATH=backend python aws/lambda_function.py
+from services.similarity_index import SimilarityIndex
+
+TOP_N = 10
+PAGE_SIZE = 1000      # PostgREST caps a single select at 1000 rows by default
+BLOCK_SIZE = 512      # users scored per matmul block
+UPSERT_BATCH = 500    # rows per bulk upsert request
+
+def fetch_embeddings(page_size: int = PAGE_SIZE):
     """
-    For all onboarded users with existing embeddings,
-    recompute and update the recommended users list.
+    Page through all onboarded users with an embedding.
+    Returns (index, updated_at) where updated_at[i] belongs to index.ids[i].
     """
-    # This performs a join between the User and user_vectors table on user.id = user_vectors.user_id
-    response = (
-        supabase
-        .table("User")
-        .select("id, user_vectors(embedding)")
-        .eq("has_onboarded", True)
-        .execute()
-    )
+    user_ids, vectors, updated_at = [], [], []
+    start = 0
+    while True:
+        # This performs a join between the User and user_vectors table on user.id = user_vectors.user_id
+        response = (
+            supabase
+            .table("User")
+            .select("id, user_vectors(embedding, updated_at)")
+            .eq("has_onboarded", True)
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = response.data or []
+        for row in rows:
+            user_vectors = row.get("user_vectors")
+            if isinstance(user_vectors, list):
+                user_vectors = user_vectors[0] if user_vectors else None
+            if not user_vectors or not user_vectors.get("embedding"):
+                continue
+            user_ids.append(row["id"])
+            vectors.append(user_vectors["embedding"])
+            updated_at.append(user_vectors.get("updated_at"))
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+    index = SimilarityIndex(capacity=len(user_ids))
+    index.add_many(user_ids, vectors)
+    return index, updated_at
+
+def fetch_recommendations(user_ids: list, page_size: int = PAGE_SIZE) -> dict:
+    """
+    Load the stored recommendation lists for the given users, keyed by user id.
+    """
+    stored = {}
+    for i in range(0, len(user_ids), page_size):
+        chunk = user_ids[i:i + page_size]
+        response = (
+            supabase
+            .table("recommendations")
+            .select("user_id, recommended_user_ids")
+            .in_("user_id", chunk)
+            .execute()
+        )
+        for row in response.data or []:
+            stored[row["user_id"]] = row.get("recommended_user_ids") or []
+    return stored
+
+def find_dirty_rows(index: SimilarityIndex, changed: set, stored: dict, top_n: int = TOP_N) -> np.ndarray:
+    """
+    Return the row indexes whose top_n could have changed because of the `changed` users.
+    A row is dirty if it changed itself, has no full stored list, recommends a changed
+    user, or a changed user now scores above its current k-th neighbour.
+    """
+    user_ids, matrix = index.ids, index.matrix
+    changed_rows = np.array([index.position(u) for u in changed if u in index], dtype=np.int64)
+    dirty = np.zeros(len(user_ids), dtype=bool)
+    if changed_rows.size == 0:
+        return np.flatnonzero(dirty)
+    dirty[changed_rows] = True
+
+    # Similarity threshold of each user's stored k-th neighbour
+    threshold = np.full(len(user_ids), np.inf, dtype=np.float32)
+    for i, user_id in enumerate(user_ids):
+        recs = [r for r in stored.get(user_id, []) if r in index]
+        if len(recs) < min(top_n, len(user_ids) - 1) or changed.intersection(recs):
+            dirty[i] = True
+            continue
+        threshold[i] = float(matrix[i] @ matrix[index.position(recs[-1])])
+
+    for start in range(0, len(user_ids), BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, len(user_ids))
+        scores = matrix[start:stop] @ matrix[changed_rows].T
+        # Ignore a changed user's similarity to itself
+        self_hits = (changed_rows[None, :] == np.arange(start, stop)[:, None])
+        scores[self_hits] = -np.inf
+        dirty[start:stop] |= scores.max(axis=1) > threshold[start:stop]
+    return np.flatnonzero(dirty)
+
+def changed_user_ids(user_ids: list, updated_at: list, since: str) -> set:
+    cutoff = parse_timestamp(since)
+    return {u for u, ts in zip(user_ids, updated_at) if ts and parse_timestamp(ts) >= cutoff}
+
+def parse_timestamp(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def upsert_recommendations(rows: list):
+    for i in range(0, len(rows), UPSERT_BATCH):
+        supabase.table("recommendations").upsert(rows[i:i + UPSERT_BATCH]).execute()
+    invalidate_cached_recommendations([row["user_id"] for row in rows])
 
-    users = response.data or []
+_redis = None
+def invalidate_cached_recommendations(user_ids: list):
+    global _redis
+    if not REDIS_URL or not user_ids:
+        return
+    import redis
+    try:
+        if _redis is None:
+            _redis = redis.Redis.from_url(REDIS_URL)
+        # Dropping the /people version stamps too changes the users' ETags
+        _redis.delete(
+            *(RECOMMENDATIONS_CACHE_PREFIX + user_id for user_id in user_ids),
+            *(PEOPLE_VERSION_PREFIX + user_id for user_id in user_ids)
+        )
+    except redis.RedisError as e:
+        print("Exception during cache invalidation:", e)
 
-    for user in users:
-        user_id = user["id"]
-        user_vectors = user.get("user_vectors")
-        embedding = user_vectors["embedding"] if user_vectors else None
-        if not embedding: continue
+def update_all_recommendations(since: str = None, user_ids: list = None, top_n: int = TOP_N) -> int:
+    """
+    For all onboarded users with existing embeddings,
+    recompute and update the recommended users list.
+    With `since` (ISO timestamp) or `user_ids`, only rows whose neighbourhoods
+    could have changed are recomputed.
+    Returns the number of recommendation rows written.
+    """
+    index, updated_at = fetch_embeddings()
+    all_ids = index.ids
+    if not all_ids:
+        return 0
 
-        similar_users = get_similar_users_rpc(embedding, user_id)
+    if since is None and user_ids is None:
+        rows = np.arange(len(all_ids))
+    else:
+        changed = set(user_ids or [])
+        if since is not None:
+            changed |= changed_user_ids(all_ids, updated_at, since)
+        stored = fetch_recommendations(all_ids)
+        rows = find_dirty_rows(index, changed, stored, top_n)
 
-        supabase.table("recommendations").upsert({
-            "user_id": user_id,
-            "recommended_user_ids": similar_users
-        }).execute()
+    pending = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        neighbours = index.neighbours(block, top_n)
+        for row, cols in zip(block, neighbours):
+            pending.append({
+                "user_id": all_ids[row],
+                "recommended_user_ids": [all_ids[c] for c in cols]
+            })
+        if len(pending) >= UPSERT_BATCH:
+            upsert_recommendations(pending)
+            pending = []
+    upsert_recommendations(pending)
+    return len(rows)
 
 def lambda_handler(event, context):
-    update_all_recommendations()
-    return {"status": "success"}
\ No newline at end of file
+    event = event or {}
+    updated = update_all_recommendations(
+        since=event.get("since"),
+        user_ids=event.get("user_ids")
+    )
+    return {"status": "success", "updated": updated}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the recommendations table.")
+    parser.add_argument("--since", help="only refresh neighbourhoods touched by embeddings updated at or after this ISO timestamp")
+    parser.add_argument("--user-ids", nargs="*", help="only refresh neighbourhoods touched by these users")
+    args = parser.parse_args()
+    print(lambda_handler({"since": args.since, "user_ids": args.user_ids}, None))
@@ -1,23 +1,92 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from jose import JWTError
 from services import jwt_service
 
 security = HTTPBearer()
 
-def get_current_user(
+class VerifiedTokenCache:
+    """
+    LRU cache of already-verified access tokens. Entries are only returned
+    until the token's own exp, so caching never extends a token's lifetime.
+    """
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._data.get(token)
+            if entry is None:
+                return None
+            payload, exp = entry
+            if exp <= time.time():
+                del self._data[token]
+                return None
+            self._data.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        with self._lock:
+            self._data[token] = (payload, float(exp))
+            self._data.move_to_end(token)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+token_cache = VerifiedTokenCache(int(os.getenv("JWT_CACHE_SIZE", "10000")))
+
+def _current_user(payload: dict) -> dict:
+    user = {"user_id": payload["sub"]}
+    # Compact profile claims, when the token carries them
+    if "onb" in payload:
+        user["has_onboarded"] = payload["onb"]
+    if "iv" in payload:
+        user["image_digest"] = payload["iv"]
+    return user
+
+def verify_access_token(token: str) -> dict:
+    """
+    The payload of a valid access token, from token_cache when possible.
+    Raises JWTError for invalid or expired tokens and ValueError for tokens
+    that are not access tokens.
+    """
+    token = token.strip()
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt_service.decode_token(token)
+        # Refresh tokens are only accepted by /token/refresh
+        if payload.get("sub") is None or payload.get("typ", "access") != "access":
+            raise ValueError("Not an access token")
+        token_cache.put(token, payload)
+    return payload
+
+def user_from_token(token: str) -> Optional[dict]:
+    """Like get_current_user, for callers outside FastAPI (socket.io). None if the token is not valid."""
+    try:
+        return _current_user(verify_access_token(token))
+    except (JWTError, ValueError):
+        return None
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    token = credentials.credentials.strip()
     try:
-        payload = jwt.decode(token, jwt_service.SECRET_KEY, algorithms=[jwt_service.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return {"user_id": user_id}
+        payload = verify_access_token(credentials.credentials)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return _current_user(payload)
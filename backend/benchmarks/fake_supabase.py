@@ -0,0 +1,332 @@
+"""
+In-memory stand-in for the async Supabase client, for benchmarks.
+
+Implements the parts of the PostgREST query builder and the RPCs the API
+uses, over plain Python lists. Every execute() counts as one database round
+trip (one HTTP request to Supabase in production) and can sleep for a
+simulated network latency, so benchmarks can report round trips per endpoint.
+"""
+import asyncio
+import itertools
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+PROFILE_FIELDS = (
+    "id", "first_name", "last_name", "bio", "image_url",
+    "user_domain", "user_sector", "skills",
+    "linkedin_url", "github_url", "twitter_url",
+)
+
+def _epoch_us(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+
+def _profile(user: dict) -> dict:
+    return {field: user.get(field) for field in PROFILE_FIELDS}
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.filters = []
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self._order = None
+        self._limit = None
+        self._range = None
+
+    def select(self, columns: str = "*", **kwargs):
+        self.columns = columns
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, **kwargs):
+        self.op, self.payload = "upsert", rows
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, data: dict):
+        self.op, self.payload = "update", data
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def neq(self, column: str, value):
+        self.filters.append(lambda row: str(row.get(column)) != str(value))
+        return self
+
+    def in_(self, column: str, values):
+        wanted = {str(v) for v in values}
+        self.filters.append(lambda row: str(row.get(column)) in wanted)
+        return self
+
+    def contains(self, column: str, values):
+        wanted = {str(v) for v in values}
+        self.filters.append(lambda row: wanted <= {str(v) for v in row.get(column) or []})
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
+    def _matching(self) -> list:
+        return [row for row in self.db.tables[self.table] if all(f(row) for f in self.filters)]
+
+    def _project(self, row: dict) -> dict:
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self.columns.split(",")}
+
+    async def execute(self) -> FakeResponse:
+        await self.db.round_trip(f"{self.op} {self.table}")
+        rows = self.db.tables[self.table]
+
+        if self.op == "insert" or self.op == "upsert":
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            keys = [k.strip() for k in (self.on_conflict or "").split(",") if k.strip()]
+            written = []
+            for new in payload:
+                new = dict(new)
+                if self.table == "User":
+                    new.setdefault("id", str(uuid.uuid4()))
+                existing = None
+                if self.op == "upsert" and keys:
+                    existing = next((r for r in rows if all(str(r.get(k)) == str(new.get(k)) for k in keys)), None)
+                if existing is None:
+                    rows.append(new)
+                    written.append(new)
+                elif not self.ignore_duplicates:
+                    existing.update(new)
+                    written.append(existing)
+            return FakeResponse([dict(r) for r in written])
+
+        matching = self._matching()
+        if self.op == "update":
+            for row in matching:
+                row.update(self.payload)
+            return FakeResponse([dict(r) for r in matching])
+        if self.op == "delete":
+            self.db.tables[self.table] = [r for r in rows if r not in matching]
+            return FakeResponse([dict(r) for r in matching])
+
+        if self._order:
+            column, desc = self._order
+            matching.sort(key=lambda r: str(r.get(column)), reverse=desc)
+        if self._range:
+            matching = matching[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            matching = matching[:self._limit]
+        return FakeResponse([self._project(r) for r in matching])
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    async def execute(self) -> FakeResponse:
+        await self.db.round_trip(f"rpc {self.name}")
+        handler = getattr(self.db, f"_rpc_{self.name}", None)
+        if handler is None:
+            raise NotImplementedError(f"FakeSupabase has no RPC {self.name}")
+        return FakeResponse(handler(**self.params))
+
+class _FakeHttpClient:
+    async def aclose(self):
+        pass
+
+class _FakeOptions:
+    httpx_client = _FakeHttpClient()
+
+class FakeSupabase:
+    """
+    Async Supabase client over in-memory tables. latency_ms is slept on every round trip.
+    """
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.options = _FakeOptions()
+        self.tables = {name: [] for name in ("User", "Likes", "Matches", "Messages", "recommendations", "user_vectors", "match_events")}
+        self.calls = Counter()
+        self._event_ids = itertools.count(1)
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    async def round_trip(self, label: str) -> None:
+        self.calls[label] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            # Still yield, as a real request would
+            await asyncio.sleep(0)
+
+    def table(self, name: str) -> FakeQuery:
+        self.tables.setdefault(name, [])
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeRpc:
+        return FakeRpc(self, name, params or {})
+
+    # Lookups used by the RPCs
+    def _users(self) -> dict:
+        return {str(u["id"]): u for u in self.tables["User"]}
+
+    def _liked(self, user_id: str) -> set:
+        return {str(l["likee_id"]) for l in self.tables["Likes"] if str(l["liker_id"]) == str(user_id)}
+
+    def _match(self, a: str, b: str) -> Optional[dict]:
+        low, high = sorted((str(a), str(b)))
+        return next((m for m in self.tables["Matches"] if m["user1_id"] == low and m["user2_id"] == high), None)
+
+    # RPCs, mirroring supabase/functions
+    def _rpc_get_recommended_profiles(self, target_user_id, after_rank=0, page_size=20):
+        rec = next((r for r in self.tables["recommendations"] if str(r["user_id"]) == str(target_user_id)), None)
+        if rec is None:
+            return []
+        users, liked = self._users(), self._liked(target_user_id)
+        page = []
+        for rank, user_id in enumerate(rec["recommended_user_ids"], start=1):
+            user = users.get(str(user_id))
+            if rank <= after_rank or user is None or not user.get("has_onboarded") or str(user_id) in liked:
+                continue
+            page.append({"rank": rank, **_profile(user)})
+            if len(page) == page_size:
+                break
+        return page
+
+    def _rpc_get_onboarded_profiles(self, target_user_id, after_id=None, page_size=20):
+        liked = self._liked(target_user_id)
+        users = sorted(
+            (u for u in self.tables["User"]
+             if u.get("has_onboarded") and str(u["id"]) != str(target_user_id) and str(u["id"]) not in liked
+             and (after_id is None or str(u["id"]) > str(after_id))),
+            key=lambda u: str(u["id"])
+        )
+        return [_profile(u) for u in users[:page_size]]
+
+    def _rpc_like_user(self, liker, likee, liked_at=None):
+        if str(liker) == str(likee):
+            raise ValueError("A user cannot like themselves")
+        created = str(likee) not in self._liked(liker)
+        if created:
+            self.tables["Likes"].append({
+                "like_id": str(uuid.uuid4()), "liker_id": str(liker), "likee_id": str(likee),
+                "liked_at": liked_at or datetime.now(timezone.utc).isoformat(),
+            })
+            # What the insert_match trigger does
+            if str(liker) in self._liked(likee) and self._match(liker, likee) is None:
+                low, high = sorted((str(liker), str(likee)))
+                match_id = str(uuid.uuid4())
+                self.tables["Matches"].append({
+                    "match_id": match_id, "user1_id": low, "user2_id": high,
+                    "matched_at": datetime.now(timezone.utc).isoformat(),
+                })
+                # What the enqueue_match_event trigger does
+                self.tables["match_events"].append({"id": next(self._event_ids), "match_id": match_id})
+        match = self._match(liker, likee)
+        user = self._users().get(str(likee), {}) if match else {}
+        return [{
+            "likee_id": str(likee),
+            "created": created,
+            "is_match": match is not None,
+            "match_id": match["match_id"] if match else None,
+            "first_name": user.get("first_name"),
+            "last_name": user.get("last_name"),
+            "image_url": user.get("image_url"),
+        }]
+
+    def _rpc_like_users(self, liker, likes):
+        results = []
+        for likee in dict.fromkeys(str(like["likee_id"]) for like in likes):
+            if likee != str(liker):
+                results.extend(self._rpc_like_user(liker, likee))
+        return results
+
+    def _rpc_claim_match_events(self, batch_size=100):
+        claimed = self.tables["match_events"][:batch_size]
+        del self.tables["match_events"][:batch_size]
+        users = self._users()
+        events = []
+        for event in claimed:
+            match = next((m for m in self.tables["Matches"] if m["match_id"] == event["match_id"]), None)
+            if match is None:
+                continue
+            events.append({
+                "event_id": event["id"], "match_id": match["match_id"], "matched_at": match["matched_at"],
+                **{
+                    key: {field: users.get(match[column], {}).get(field) for field in ("id", "first_name", "last_name", "image_url")}
+                    for key, column in (("user1", "user1_id"), ("user2", "user2_id"))
+                },
+            })
+        return events
+
+    def _message_rows(self, match_id) -> list:
+        rows = []
+        for m in self.tables["Messages"]:
+            if str(m["match_id"]) != str(match_id):
+                continue
+            sent_at_us = _epoch_us(m["sent_at"])
+            rows.append({
+                "message_id": str(m["message_id"]), "sender_id": str(m["sender_id"]),
+                "content": m["content"], "sent_at_ms": sent_at_us // 1000,
+                "sent_at_us": sent_at_us, "seq": m.get("seq"),
+            })
+        rows.sort(key=lambda r: (r["sent_at_us"], r["message_id"]))
+        return rows
+
+    def _rpc_get_messages_page(self, target_match_id, before_us=None, before_id=None,
+                               after_us=None, after_id=None, page_limit=50):
+        rows = self._message_rows(target_match_id)
+        if after_us is not None:
+            cursor = (after_us, after_id or "")
+            return [r for r in rows if (r["sent_at_us"], r["message_id"]) > cursor][:page_limit]
+        if before_us is not None:
+            cursor = (before_us, before_id or "￿")
+            rows = [r for r in rows if (r["sent_at_us"], r["message_id"]) < cursor]
+        return rows[-page_limit:]
+
+    def _rpc_get_messages_by_seq(self, target_match_id, from_seq, to_seq=None, page_limit=50):
+        rows = [r for r in self._message_rows(target_match_id)
+                if r["seq"] is not None and r["seq"] >= from_seq and (to_seq is None or r["seq"] <= to_seq)]
+        return sorted(rows, key=lambda r: r["seq"])[:page_limit]
+
+    def _rpc_get_max_message_seq(self, target_match_id):
+        return max((r["seq"] for r in self._message_rows(target_match_id) if r["seq"] is not None), default=0)
+
+    def _rpc_matched_users_object(self, target_user_id):
+        users = self._users()
+        result = []
+        for m in self.tables["Matches"]:
+            if str(target_user_id) not in (m["user1_id"], m["user2_id"]):
+                continue
+            other = m["user2_id"] if m["user1_id"] == str(target_user_id) else m["user1_id"]
+            result.append({"match_id": m["match_id"], "matched_at": m["matched_at"], "other_user": _profile(users.get(other, {}))})
+        return result
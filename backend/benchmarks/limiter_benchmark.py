@@ -0,0 +1,109 @@
+"""
+Throughput and latency of TokenBucket.allow() against a real Redis.
+
+Compares three ways of running the same bucket:
+  eval    - the script body sent with EVAL on every call (the old behaviour)
+  evalsha - the registered script, sent by SHA
+  leased  - the registered script taking --lease tokens per round trip and
+            spending them locally
+
+Each mode runs --calls allow() calls from --concurrency tasks spread over
+--identities users. The buckets are sized so nobody is limited; this measures
+the cost of the check itself.
+
+    cd backend
+    REDIS_URL=redis://localhost:6379/0 python benchmarks/limiter_benchmark.py --calls 20000 --lease 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limiter import TOKEN_BUCKET_LUA, TokenBucket, get_redis
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+class EvalTokenBucket(TokenBucket):
+    """The bucket as it was before register_script: full script body on every call."""
+    async def _take(self, key, wanted):
+        now_ms = int(time.time() * 1000)
+        granted, retry_ms, tokens = await self.redis.eval(
+            TOKEN_BUCKET_LUA, 1, key, self.capacity, self.refill, now_ms, wanted
+        )
+        return int(granted), int(retry_ms) / 1000.0, int(tokens)
+
+async def run_mode(name: str, bucket: TokenBucket, args) -> dict:
+    scope = f"bench-{uuid.uuid4().hex[:8]}"
+    latencies = []
+    denied = 0
+    per_task = args.calls // args.concurrency
+
+    async def worker(worker_id: int):
+        nonlocal denied
+        for i in range(per_task):
+            identity = f"user:{(worker_id * per_task + i) % args.identities}"
+            start = time.perf_counter()
+            allowed, _, _ = await bucket.allow(scope, identity)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not allowed:
+                denied += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": name,
+        "calls": len(latencies),
+        "denied": denied,
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+async def main(args):
+    redis = get_redis()
+    await redis.ping()
+    # Large enough that the benchmark never hits the limit
+    capacity = args.calls
+    refill = float(args.calls)
+    modes = [
+        ("eval", EvalTokenBucket(redis, capacity, refill)),
+        ("evalsha", TokenBucket(redis, capacity, refill)),
+        ("leased", TokenBucket(redis, capacity, refill, lease_size=args.lease, lease_ttl_ms=args.lease_ttl_ms)),
+    ]
+    results = []
+    for name, bucket in modes:
+        # Warm up the connection pool and the script cache
+        await bucket.allow("bench-warmup", "warmup")
+        results.append(await run_mode(name, bucket, args))
+    await redis.aclose()
+
+    for result in results:
+        print(
+            f"{result['mode']:>8}: {result['ops_per_sec']:>10} ops/s  "
+            f"p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms  denied {result['denied']}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--identities", type=int, default=100)
+    parser.add_argument("--lease", type=int, default=20)
+    parser.add_argument("--lease-ttl-ms", type=int, default=1000)
+    parser.add_argument("--json", help="also write the results to this file")
+    asyncio.run(main(parser.parse_args()))
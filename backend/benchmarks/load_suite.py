@@ -0,0 +1,317 @@
+"""
+Synthetic load on the API's hot paths, with per-endpoint DB round-trip counts.
+
+Runs the real app (main.py, including its lifespan) under uvicorn in this
+process, with Supabase replaced by the in-memory FakeSupabase from
+fake_supabase.py and a local Redis (REDIS_URL) behind the caches, limiters,
+chat pipeline and socket.io. It seeds --users synthetic users with embeddings,
+recommendations, matches and chat history, then drives each scenario with
+--requests requests at --concurrency:
+
+  signin        POST /signin
+  people        GET /people
+  like          POST /like
+  messages      GET /messages
+  send_message  socket.io sendMessage, timed until the server's ack
+
+For each scenario it reports throughput, p50/p95/p99 latency and the
+Supabase round trips made (total, per request and per call type). Results
+are written to --output as JSON. Pass an earlier file as --baseline to print
+the change.
+
+Rate limits and the password pool's load shedding are lifted for the run
+unless --keep-rate-limits is given. send_message needs aiohttp for the
+socket.io client.
+
+--db-latency-ms adds a simulated network delay to every round trip. The
+load generator shares the server's event loop, so compare runs on the same
+machine with the same settings.
+
+    cd backend
+    BCRYPT_ROUNDS=6 python benchmarks/load_suite.py --users 2000 --requests 2000 --concurrency 50 \\
+        --db-latency-ms 5 --output load_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Placeholders so supabase_client and jwt_service import without a real project
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_KEY", "fake-key")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+import httpx
+import numpy as np
+import socketio
+import uvicorn
+
+import supabase_client
+from fake_supabase import FakeSupabase
+
+PASSWORD = "benchmark-password"
+SCENARIOS = ["signin", "people", "like", "messages", "send_message"]
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def seed(db: FakeSupabase, args, password_hash: str) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    users = []
+    for i in range(args.users):
+        users.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "email": f"user{i}@bench.local",
+            "password": password_hash,
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "bio": f"Synthetic user {i}",
+            "image_url": None,
+            "user_domain": ["Software"],
+            "user_sector": ["Education"],
+            "skills": ["python", "sql"],
+            "has_onboarded": True,
+        })
+    db.tables["User"] = users
+    ids = [u["id"] for u in users]
+
+    vectors = np.random.default_rng(args.seed).standard_normal((len(ids), 384)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    db.tables["user_vectors"] = [
+        {"user_id": user_id, "embedding": vector.tolist(), "updated_at": now.isoformat()}
+        for user_id, vector in zip(ids, vectors)
+    ]
+    db.tables["recommendations"] = [
+        {"user_id": user_id, "recommended_user_ids": rng.sample([o for o in ids if o != user_id], min(50, len(ids) - 1))}
+        for user_id in ids
+    ]
+
+    matches = []
+    for _ in range(args.matches):
+        low, high = sorted(rng.sample(ids, 2))
+        matches.append({"match_id": str(uuid.uuid4()), "user1_id": low, "user2_id": high, "matched_at": now.isoformat()})
+    db.tables["Matches"] = matches
+    db.tables["Messages"] = [
+        {
+            "message_id": str(uuid.uuid4()),
+            "match_id": match["match_id"],
+            "sender_id": match["user1_id"] if n % 2 else match["user2_id"],
+            "content": f"message {n}",
+            "sent_at": (now - timedelta(minutes=args.messages_per_match - n)).isoformat(),
+            "seq": None,
+        }
+        for match in matches
+        for n in range(args.messages_per_match)
+    ]
+    return {"users": users, "matches": matches}
+
+def lift_rate_limits(main) -> None:
+    from limiter import RateLimiter, SlidingWindowLog
+    for value in vars(main).values():
+        if isinstance(value, SlidingWindowLog):
+            value.limit = 10 ** 9
+        elif isinstance(value, RateLimiter):
+            value.capacity = 10 ** 9
+            value.refill = 10.0 ** 9
+
+async def run_scenario(request, db: FakeSupabase, args, settle: float = 0.0) -> dict:
+    """Call request(i) args.requests times from args.concurrency workers."""
+    latencies = []
+    errors = Counter()
+    counter = iter(range(args.requests))
+    before = Counter(db.calls)
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await request(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors[type(e).__name__ if not str(e) else str(e)[:80]] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    # Let write-behind work (chat persistence) land so its round trips are counted
+    if settle:
+        await asyncio.sleep(settle)
+
+    calls = Counter(db.calls)
+    calls.subtract(before)
+    calls = {label: count for label, count in calls.items() if count}
+    round_trips = sum(calls.values())
+    completed = len(latencies)
+    return {
+        "requests": args.requests,
+        "completed": completed,
+        "errors": dict(errors),
+        "throughput_rps": round(completed / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+        "db_round_trips": round_trips,
+        "db_round_trips_per_request": round(round_trips / completed, 2) if completed else None,
+        "db_calls": calls,
+    }
+
+async def main(args):
+    db = FakeSupabase(latency_ms=args.db_latency_ms)
+    # get_async_supabase() returns the existing client, so the app never builds a real one
+    supabase_client._async_supabase = db
+
+    import main as app_module
+    from services import jwt_service, password_service
+
+    data = seed(db, args, password_service.pwd_context.hash(PASSWORD))
+    users, matches = data["users"], data["matches"]
+    if not args.keep_rate_limits:
+        lift_rate_limits(app_module)
+        # Queue sign-ins instead of shedding them, so signin measures bcrypt throughput
+        password_service.PASSWORD_MAX_PENDING = max(password_service.PASSWORD_MAX_PENDING, args.concurrency)
+    # Start the password pool's worker processes before anything is timed
+    await password_service.verify_password(PASSWORD, users[0]["password"])
+    tokens = {u["id"]: jwt_service.create_jwt_token(u["id"], jwt_service.compact_claims(u)) for u in users}
+    rng = random.Random(args.seed)
+
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server_task.done():
+            server_task.result()
+        await asyncio.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as http:
+            def auth(user_id):
+                return {"Authorization": f"Bearer {tokens[user_id]}"}
+
+            async def checked(response):
+                if response.status_code >= 400:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+
+            async def signin(i):
+                user = users[rng.randrange(len(users))]
+                await checked(await http.post("/signin", json={"email": user["email"], "password": PASSWORD}))
+
+            async def people(i):
+                user = users[rng.randrange(len(users))]
+                await checked(await http.get("/people", headers=auth(user["id"])))
+
+            async def like(i):
+                liker, likee = rng.sample(users, 2)
+                await checked(await http.post("/like", json={"likee_id": likee["id"]}, headers=auth(liker["id"])))
+
+            async def messages(i):
+                match = matches[rng.randrange(len(matches))]
+                await checked(await http.get(
+                    "/messages", params={"matchId": match["match_id"]}, headers=auth(match["user1_id"])
+                ))
+
+            scenarios = {"signin": signin, "people": people, "like": like, "messages": messages}
+            for name in args.scenarios:
+                if name in scenarios:
+                    print(f"Running {name}")
+                    results[name] = await run_scenario(scenarios[name], db, args)
+
+        if "send_message" in args.scenarios:
+            print("Running send_message")
+            clients = []
+            for n in range(min(args.concurrency, len(matches))):
+                client = socketio.AsyncClient()
+                match = matches[n]
+                # Sockets chat as the user in their token
+                await client.connect(base_url, transports=["websocket"], auth={"token": tokens[match["user1_id"]]})
+                await client.call("joinRoom", match["match_id"])
+                clients.append((client, match))
+
+            async def send_message(i):
+                client, match = clients[i % len(clients)]
+                await client.call("sendMessage", {
+                    "roomId": match["match_id"],
+                    "from": match["user1_id"],
+                    "message": f"load test {i}",
+                }, timeout=30)
+
+            results["send_message"] = await run_scenario(
+                send_message, db, args,
+                settle=app_module.message_pipeline.flush_interval * 4
+            )
+            for client, _ in clients:
+                await client.disconnect()
+    finally:
+        server.should_exit = True
+        await server_task
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("users", "matches", "messages_per_match", "requests", "concurrency", "db_latency_ms", "keep_rate_limits", "seed")
+        },
+        "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        line = (
+            f"{name:>13}: {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+            f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+            f"db {result['db_round_trips_per_request']}/req  errors {sum(result['errors'].values())}"
+        )
+        if baseline and name in baseline and baseline[name]["throughput_rps"]:
+            old = baseline[name]
+            line += (
+                f"  | vs baseline: throughput {100 * (result['throughput_rps'] / old['throughput_rps'] - 1):+.1f}%"
+                f", p99 {result['p99_ms'] - old['p99_ms']:+.2f} ms"
+                f", db/req {old['db_round_trips_per_request']} -> {result['db_round_trips_per_request']}"
+            )
+        print(line)
+    print("Results written to", args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--matches", type=int, default=200)
+    parser.add_argument("--messages-per-match", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--keep-rate-limits", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    asyncio.run(main(parser.parse_args()))
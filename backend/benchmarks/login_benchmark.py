@@ -0,0 +1,75 @@
+"""
+Password verification throughput against the size of the bcrypt process pool.
+
+For each worker count, verifies --logins passwords through
+services.password_service with --concurrency sign-ins in flight at a time,
+and reports logins per second and latency percentiles. Throughput should grow
+roughly linearly up to the number of physical cores. The same run through
+the default threadpool is shown for comparison.
+
+    cd backend
+    python benchmarks/login_benchmark.py --workers 1 2 4 8 --logins 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.concurrency import run_in_threadpool
+from services import password_service
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+async def run(verify, hashed: str, args) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            assert await verify("correct horse battery staple", hashed)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    return {
+        "logins_per_sec": round(args.logins / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+async def main(args):
+    hashed = password_service.pwd_context.hash("correct horse battery staple")
+    print(f"bcrypt rounds {password_service.BCRYPT_ROUNDS}, {os.cpu_count()} cores")
+
+    result = await run(
+        lambda password, h: run_in_threadpool(password_service.pwd_context.verify, password, h),
+        hashed, args
+    )
+    print(f"{'threadpool':>12}: {result['logins_per_sec']:>8} logins/s  p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms")
+
+    for workers in args.workers:
+        password_service.shutdown()
+        password_service.PASSWORD_WORKERS = workers
+        # Let the whole run queue; this measures throughput, not shedding
+        password_service.PASSWORD_MAX_PENDING = args.logins
+        await password_service.verify_password("warm up", hashed)
+        result = await run(password_service.verify_password, hashed, args)
+        print(f"{workers:>3} workers: {result['logins_per_sec']:>8} logins/s  p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms")
+    password_service.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
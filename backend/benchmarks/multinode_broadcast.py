@@ -0,0 +1,143 @@
+"""
+Cross-node socket.io broadcast latency as the number of API nodes grows.
+
+For each node count N, starts N uvicorn processes (one worker each, ports
+--base-port..) sharing the same Redis, spreads --clients socket.io clients
+round-robin across them, joins them all to one room, and sends --messages chat
+messages from a client on node 0. Latency is measured from sendMessage to each
+receiveMessage, so every delivery to a client on another node has gone through
+the Redis pub/sub client manager.
+
+Needs Redis (REDIS_URL) and the backend's usual environment, plus an existing
+match id, one of its users as the sender and that user's access token. Every
+client connects with it, since only a match's users can join or send to its
+room. Messages are persisted by the write-behind flusher, so point
+SUPABASE_URL at a scratch project.
+
+    cd backend
+    pip install aiohttp
+    python benchmarks/multinode_broadcast.py --room <match_id> --sender <user_id> --token <jwt> --nodes 1 2 4 --clients 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+import socketio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+async def wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{url}/openapi.json")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not start")
+
+def start_nodes(count: int, base_port: int) -> list:
+    procs = []
+    for i in range(count):
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(base_port + i), "--log-level", "warning"],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+    return procs
+
+def stop_nodes(procs: list):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+async def run_round(args, node_count: int) -> dict:
+    urls = [f"http://127.0.0.1:{args.base_port + i}" for i in range(node_count)]
+    procs = start_nodes(node_count, args.base_port)
+    try:
+        await asyncio.gather(*(wait_until_up(url) for url in urls))
+
+        room = args.room
+        sent_at = {}
+        latencies = []
+        clients = []
+        for i in range(args.clients):
+            client = socketio.AsyncClient()
+
+            @client.on("receiveMessage")
+            async def on_message(data):
+                start = sent_at.get(data.get("message"))
+                if start is not None:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            await client.connect(urls[i % node_count], transports=["websocket"], auth={"token": args.token})
+            await client.emit("joinRoom", room)
+            clients.append(client)
+        # Let room joins propagate
+        await asyncio.sleep(1.0)
+
+        sender = args.sender
+        for i in range(args.messages):
+            body = f"bench-{node_count}-{i}-{time.time_ns()}"
+            sent_at[body] = time.perf_counter()
+            await clients[0].emit("sendMessage", {"from": sender, "roomId": room, "message": body})
+            await asyncio.sleep(args.interval)
+
+        deadline = time.perf_counter() + 5
+        while len(latencies) < args.messages * args.clients and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+        for client in clients:
+            await client.disconnect()
+    finally:
+        stop_nodes(procs)
+
+    return {
+        "nodes": node_count,
+        "deliveries": len(latencies),
+        "expected": args.messages * args.clients,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.mean(latencies) if latencies else float("nan"),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--room", required=True, help="match id to chat in")
+    parser.add_argument("--sender", required=True, help="user id sending the messages")
+    parser.add_argument("--token", required=True, help="the sender's access token")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=8, help="kept under the chat rate limit's capacity")
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between messages")
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = [await run_round(args, n) for n in args.nodes]
+
+    print(f"{'nodes':>5}{'delivered':>14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['nodes']:>5}{r['deliveries']:>8}/{r['expected']:<5}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Cost of turning a /people page into a response body.
+
+Compares, for pages of --sizes profiles:
+  validated - what FastAPI does for a response_model: validate the rows
+              against List[PeopleResponse] and serialize the models to JSON
+              (the old /people path)
+  orjson    - the rows rendered as they are with responses.ORJSONResponse
+              (the current path)
+
+Both include the None -> "" pass over the optional fields. Times are per
+response, averaged over --iterations.
+
+    cd backend
+    python benchmarks/serialization_benchmark.py --sizes 10 100 1000 --iterations 200
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Placeholders so main imports without a real project
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_KEY", "fake-key")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import main
+from responses import ORJSONResponse
+
+# FastAPI versions that can dump a response_model straight to JSON bytes do so for JSONResponse
+DUMP_JSON = "dump_json" in inspect.signature(serialize_response).parameters
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def profiles(count: int) -> list:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "bio": f"Synthetic user {i}, " + "building things with Python and SQL. " * 4,
+            "image_url": None if i % 3 else f"https://cdn.example.com/profiles/{i:064x}/card.webp",
+            "user_domain": ["Software", "Data"],
+            "user_sector": ["Education"],
+            "skills": ["python", "sql", "react", "docker"],
+            "linkedin_url": f"https://linkedin.com/in/user{i}",
+            "github_url": f"https://github.com/user{i}",
+            "twitter_url": None,
+        }
+        for i in range(count)
+    ]
+
+def fill_optional(people: list) -> list:
+    for person in people:
+        for field in main.PEOPLE_OPTIONAL_FIELDS:
+            if person.get(field) is None:
+                person[field] = ""
+    return people
+
+async def validated(people: list, field) -> bytes:
+    if DUMP_JSON:
+        return await serialize_response(field=field, response_content=fill_optional(people), dump_json=True)
+    content = await serialize_response(field=field, response_content=fill_optional(people))
+    return JSONResponse(content).body
+
+async def orjson_response(people: list, field) -> bytes:
+    return ORJSONResponse(fill_optional(people)).body
+
+async def measure(render, rows: list, field, iterations: int) -> dict:
+    timings = []
+    body = b""
+    for _ in range(iterations):
+        # Fresh dicts each time, as each request gets its own rows
+        people = [dict(row) for row in rows]
+        start = time.perf_counter()
+        body = await render(people, field)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {
+        "mean_us": round(statistics.fmean(timings), 1),
+        "p99_us": round(percentile(timings, 99), 1),
+        "us_per_profile": round(statistics.fmean(timings) / max(1, len(rows)), 2),
+        "bytes": len(body),
+    }
+
+async def run(args) -> list:
+    # main.app is the socket.io wrapper; the FastAPI app is behind it
+    route = next(r for r in main.app.other_asgi_app.routes if getattr(r, "path", None) == "/people")
+    field = route.response_field
+    results = []
+    for size in args.sizes:
+        rows = profiles(size)
+        for name, render in (("validated", validated), ("orjson", orjson_response)):
+            # Warm up
+            await measure(render, rows, field, 5)
+            result = await measure(render, rows, field, args.iterations)
+            results.append({"profiles": size, "mode": name, **result})
+    return results
+
+def report(results: list) -> None:
+    by_size = {}
+    for result in results:
+        by_size.setdefault(result["profiles"], {})[result["mode"]] = result
+        print(
+            f"{result['profiles']:>6} profiles {result['mode']:>9}: {result['mean_us']:>10} us/response  "
+            f"p99 {result['p99_us']} us  {result['us_per_profile']} us/profile  {result['bytes']} bytes"
+        )
+    for size, modes in by_size.items():
+        if "validated" in modes and "orjson" in modes and modes["orjson"]["mean_us"]:
+            print(f"{size:>6} profiles: orjson is {modes['validated']['mean_us'] / modes['orjson']['mean_us']:.1f}x faster")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,82 @@
+"""
+Startup-time benchmark for the API process.
+
+Measures, in a fresh interpreter per run:
+  - import:          time to `import main`
+  - first request:   first HTTP request served (GET /openapi.json, no DB access)
+  - first embedding: first get_text_embedding call (includes model load when lazy)
+
+Each mode is run with the model loaded lazily (current behaviour) and eagerly at
+import time (the previous behaviour, via EMBEDDING_EAGER_LOAD=1).
+
+    cd backend
+    python benchmarks/startup_benchmark.py --runs 3
+    python benchmarks/startup_benchmark.py --backend onnx-int8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client.get("/openapi.json")
+t2 = time.perf_counter()
+from services import user_service
+asyncio.run(user_service.get_text_embedding("warm up the model"))
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_request": t2 - t1, "first_embedding": t3 - t2}))
+"""
+
+def run_probe(eager: bool, backend: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("SUPABASE_KEY", "benchmark")
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+    env["EMBEDDING_BACKEND"] = backend
+    env.pop("EMBEDDING_SERVICE_URL", None)
+    if eager:
+        env["EMBEDDING_EAGER_LOAD"] = "1"
+    else:
+        env.pop("EMBEDDING_EAGER_LOAD", None)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for label, eager in (("eager (before)", True), ("lazy (after)", False)):
+        runs = [run_probe(eager, args.backend) for _ in range(args.runs)]
+        results[label] = {
+            metric: statistics.median(r[metric] for r in runs)
+            for metric in ("import", "first_request", "first_embedding")
+        }
+
+    if args.json:
+        print(json.dumps({"backend": args.backend, "runs": args.runs, "results": results}, indent=2))
+        return
+
+    print(f"backend={args.backend} runs={args.runs} (median seconds)")
+    print(f"{'mode':<16}{'import':>10}{'first req':>12}{'first embed':>14}")
+    for label, r in results.items():
+        print(f"{label:<16}{r['import']:>10.3f}{r['first_request']:>12.3f}{r['first_embedding']:>14.3f}")
+
+if __name__ == "__main__":
+    main()
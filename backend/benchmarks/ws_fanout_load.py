@@ -0,0 +1,123 @@
+"""
+Websocket fan-out latency under concurrent REST load.
+
+Connects --clients socket.io clients to one chat room, has one of them send
+--messages chat messages, and records the time from sendMessage to each
+receiveMessage. The run is repeated with --rest-concurrency workers hitting a
+REST endpoint in a tight loop, so event-loop stalls caused by blocking handlers
+show up directly as fan-out latency.
+
+Needs a running API (python -m uvicorn main:app), an existing match id for the
+room, one of its users as the sender and that user's bearer token, which
+authenticates every socket (only the match's users may join its room) and the
+REST calls:
+
+    cd backend
+    pip install aiohttp   # websocket transport for the socket.io client
+    python benchmarks/ws_fanout_load.py --room <match_id> --sender <user_id> --token <jwt>
+
+Keep --messages * --clients below the chat rate limit's capacity or raise it.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+import socketio
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+async def rest_load(args, stop: asyncio.Event, counter: list):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=30) as client:
+        while not stop.is_set():
+            try:
+                await client.get(args.rest_path)
+                counter[0] += 1
+            except httpx.HTTPError:
+                counter[1] += 1
+
+async def run_round(args, rest_concurrency: int) -> dict:
+    latencies = []
+    sent_at = {}
+    clients = []
+
+    for _ in range(args.clients):
+        client = socketio.AsyncClient()
+
+        @client.on("receiveMessage")
+        async def on_message(data):
+            start = sent_at.get(data.get("message"))
+            if start is not None:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await client.connect(args.url, transports=["websocket"], auth={"token": args.token})
+        await client.emit("joinRoom", args.room)
+        clients.append(client)
+
+    stop = asyncio.Event()
+    counter = [0, 0]
+    workers = [asyncio.create_task(rest_load(args, stop, counter)) for _ in range(rest_concurrency)]
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    for i in range(args.messages):
+        body = f"bench-{rest_concurrency}-{i}-{time.time_ns()}"
+        sent_at[body] = time.perf_counter()
+        await clients[0].emit("sendMessage", {"from": args.sender, "roomId": args.room, "message": body})
+        await asyncio.sleep(args.interval)
+
+    # Wait for stragglers
+    deadline = time.perf_counter() + 5
+    while len(latencies) < args.messages * args.clients and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*workers)
+    for client in clients:
+        await client.disconnect()
+
+    return {
+        "rest_concurrency": rest_concurrency,
+        "deliveries": len(latencies),
+        "expected": args.messages * args.clients,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.mean(latencies) if latencies else float("nan"),
+        "rest_requests_per_sec": counter[0] / elapsed,
+        "rest_errors": counter[1],
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--room", required=True, help="match id to chat in")
+    parser.add_argument("--sender", required=True, help="user id sending the messages")
+    parser.add_argument("--token", required=True, help="the sender's bearer token")
+    parser.add_argument("--rest-path", default="/matches")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between messages")
+    parser.add_argument("--rest-concurrency", type=int, nargs="+", default=[0, 16, 64])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = [await run_round(args, n) for n in args.rest_concurrency]
+
+    print(f"{'rest conc':>9}{'delivered':>12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rest rps':>10}")
+    for r in results:
+        print(f"{r['rest_concurrency']:>9}{r['deliveries']:>6}/{r['expected']:<5}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['rest_requests_per_sec']:>10.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+import asyncio
+import time
+import uuid
+import orjson
+from typing import Any, Callable, Optional
+from fastapi.concurrency import run_in_threadpool
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from limiter import get_redis
+
+# Release the single-flight lock only if we still own it
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Return the stamp at KEYS[1], creating it from ARGV[1] if there is none
+GET_OR_SET_STAMP_LUA = """
+local stamp = redis.call('GET', KEYS[1])
+if not stamp then
+  stamp = ARGV[1]
+  redis.call('SET', KEYS[1], stamp, 'EX', ARGV[2])
+end
+return stamp
+"""
+
+class VersionStamps:
+    """
+    Opaque version stamps for per-user (or per-room) API resources, stored at
+    `{prefix}:{namespace}:{ident}` and used to build ETags. A stamp is a random
+    token created on first read; bumping deletes it so the next read makes a new
+    one. Random tokens rather than counters mean a lost or expired key can never
+    bring back an ETag a client already holds for different content. The TTL
+    bounds how long changes that do not bump the stamp can go unnoticed.
+    """
+    def __init__(self, redis: Redis, namespace: str, ttl_seconds: int, prefix: str = "ver"):
+        self.redis = redis
+        self.namespace = namespace
+        self.ttl = int(ttl_seconds)
+        self.prefix = prefix
+        self._script = redis.register_script(GET_OR_SET_STAMP_LUA)
+
+    def key(self, ident: str) -> str:
+        return f"{self.prefix}:{self.namespace}:{ident}"
+
+    async def get(self, ident: str) -> Optional[str]:
+        """The current stamp, or None when Redis is unavailable."""
+        try:
+            return await self._script(keys=[self.key(ident)], args=[uuid.uuid4().hex[:16], self.ttl])
+        except RedisError as e:
+            print("Version stamp read failed:", e)
+            return None
+
+    async def bump(self, *idents: str) -> None:
+        if idents:
+            try:
+                await self.redis.delete(*(self.key(i) for i in idents))
+            except RedisError as e:
+                print("Version stamp bump failed:", e)
+
+class ReadThroughCache:
+    """
+    Redis read-through cache for one kind of value (e.g. profiles).
+    Values are JSON, stored at `{prefix}:{namespace}:{ident}`; passing a `field`
+    stores several values for one ident in a hash so they are invalidated together.
+    Concurrent misses for the same key are collapsed (single-flight) within the
+    process with a shared future and across processes with a short Redis lock.
+    """
+    def __init__(
+        self,
+        redis: Redis,
+        namespace: str,
+        ttl_seconds: int,
+        lock_ttl_ms: int = 5000,
+        prefix: str = "cache",
+        versions: Optional[VersionStamps] = None,
+    ):
+        self.redis = redis
+        self.versions = versions
+        self.namespace = namespace
+        self.ttl = int(ttl_seconds)
+        self.lock_ttl_ms = int(lock_ttl_ms)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self._inflight = {}
+
+    def key(self, ident: str) -> str:
+        return f"{self.prefix}:{self.namespace}:{ident}"
+
+    async def _read(self, key: str, field: Optional[str]):
+        raw = await (self.redis.hget(key, field) if field else self.redis.get(key))
+        return None if raw is None else orjson.loads(raw)
+
+    async def _write(self, key: str, field: Optional[str], value: Any):
+        raw = orjson.dumps(value)
+        if field:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, field, raw)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        else:
+            await self.redis.set(key, raw, ex=self.ttl)
+
+    async def _call(self, loader: Callable):
+        if asyncio.iscoroutinefunction(loader):
+            return await loader()
+        return await run_in_threadpool(loader)
+
+    async def get_or_load(self, ident: str, loader: Callable, field: Optional[str] = None):
+        """
+        Return the cached value, or call loader (sync or async) once to fill it.
+        None results are returned but not cached.
+        """
+        key = self.key(ident)
+        try:
+            value = await self._read(key, field)
+        except RedisError as e:
+            # Serve from the source of truth while Redis is unavailable
+            print("Cache read failed:", e)
+            return await self._call(loader)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        flight = (key, field)
+        future = self._inflight.get(flight)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        try:
+            value = await self._load(key, field, loader)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so waiter-less failures are not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(flight, None)
+
+    async def _load(self, key: str, field: Optional[str], loader: Callable):
+        lock_key = f"{key}:lock:{field}" if field else f"{key}:lock"
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+            # Another process is loading this key; wait briefly for it to land
+            deadline = time.monotonic() + self.lock_ttl_ms / 1000.0
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.025)
+                value = await self._read(key, field)
+                if value is not None:
+                    return value
+            token = None
+
+        try:
+            self.loads += 1
+            value = await self._call(loader)
+            if value is not None:
+                await self._write(key, field, value)
+            return value
+        finally:
+            if token:
+                await self.redis.eval(RELEASE_LOCK_LUA, 1, lock_key, token)
+
+    async def invalidate(self, *idents: str) -> None:
+        """Drop the cached values, and bump their version stamps in the same call."""
+        if idents:
+            keys = [self.key(i) for i in idents]
+            if self.versions is not None:
+                keys.extend(self.versions.key(i) for i in idents)
+            try:
+                await self.redis.delete(*keys)
+            except RedisError as e:
+                print("Cache invalidation failed:", e)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+# ETag version stamps. Profiles and /people pages are bumped whenever their
+# caches are invalidated; /people's stamp lives as long as its cached pages so
+# edits to recommended profiles show up as soon as the pages would be reloaded.
+profile_versions = VersionStamps(get_redis(), "profile", ttl_seconds=24 * 3600)
+people_versions = VersionStamps(get_redis(), "people", ttl_seconds=300)
+# Bumped for both users when a like creates a match. The short TTL covers edits
+# to the matched users' profiles, which are not tracked per match.
+match_versions = VersionStamps(get_redis(), "matches", ttl_seconds=300)
+# Per chat room, bumped after queued messages are persisted
+message_versions = VersionStamps(get_redis(), "messages", ttl_seconds=24 * 3600)
+
+# User profiles (user_service.PROFILE_COLUMNS), keyed by user id
+profile_cache = ReadThroughCache(get_redis(), "user", ttl_seconds=60, versions=profile_versions)
+# /people pages, keyed by user id with one hash field per cursor and limit.
+# The recommendation Lambda deletes these keys (and the stamps) after it refreshes a user.
+recommendations_cache = ReadThroughCache(get_redis(), "recs", ttl_seconds=300, versions=people_versions)
+# The two user ids of each match, for chat membership checks. Matches are never
+# changed or removed, so the TTL only bounds memory.
+match_members_cache = ReadThroughCache(get_redis(), "match-members", ttl_seconds=24 * 3600)
+
+def stats() -> dict:
+    return {
+        "profiles": profile_cache.stats(),
+        "recommendations": recommendations_cache.stats(),
+        "match_members": match_members_cache.stats(),
+    }
@@ -0,0 +1,43 @@
+"""
+Shared embedding worker.
+
+Run one of these per host and point the API workers at it with
+EMBEDDING_SERVICE_URL so the model weights are loaded once instead of in every
+uvicorn worker:
+
+    EMBEDDING_EAGER_LOAD=1 python -m uvicorn embedding_worker:app --port 8001 --workers 1
+
+Requests from all API processes are funnelled through the same micro-batcher.
+"""
+import os
+import asyncio
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import List
+
+# The worker itself always encodes locally
+os.environ.pop("EMBEDDING_SERVICE_URL", None)
+from services import embedding_service
+
+app = FastAPI()
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    embedder = embedding_service.get_embedder()
+    embeddings = await asyncio.gather(*(embedder.aencode(text) for text in request.texts))
+    return {
+        "embeddings": embeddings,
+        "model": embedding_service.MODEL_NAME,
+        "model_version": embedding_service.MODEL_VERSION
+    }
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "model_loaded": embedding_service.is_model_loaded(),
+        "model_version": embedding_service.MODEL_VERSION
+    }
@@ -0,0 +1,144 @@
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+# Requests slower than this are candidates for the slow-request log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Fraction of slow requests that are actually logged
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "0.1"))
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request duration",
+    ["method", "route", "status"]
+)
+DEPENDENCY_CALLS = Counter(
+    "request_dependency_calls_total", "Calls made to a dependency while serving requests",
+    ["dependency", "route"]
+)
+DEPENDENCY_DURATION = Histogram(
+    "request_dependency_seconds", "Time per request spent in a dependency",
+    ["dependency", "route"]
+)
+
+class RequestStats:
+    """
+    Call counts and time spent per dependency (supabase, redis, embedding,
+    bcrypt) while serving one request.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = {}
+
+    def record(self, dependency: str, seconds: float) -> None:
+        count, total = self.calls.get(dependency, (0, 0.0))
+        self.calls[dependency] = (count + 1, total + seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        parts = [
+            f'{name};desc="{count} calls";dur={total * 1000:.1f}'
+            for name, (count, total) in self.calls.items()
+        ]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def breakdown(self) -> dict:
+        return {
+            name: {"calls": count, "ms": round(total * 1000, 2)}
+            for name, (count, total) in self.calls.items()
+        }
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+@contextmanager
+def timed(dependency: str):
+    """
+    Attribute the enclosed work to dependency in the current request's stats.
+    Outside a request (background tasks, jobs) nothing is recorded.
+    """
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.record(dependency, time.perf_counter() - start)
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper that times every HTTP round trip as `dependency`."""
+    def __init__(self, transport: httpx.AsyncBaseTransport, dependency: str):
+        self.transport = transport
+        self.dependency = dependency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with timed(self.dependency):
+            return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with timed("redis"):
+            return await super().execute(raise_on_error)
+
+class InstrumentedRedis(Redis):
+    """Redis client that times each command (and each pipeline) as one redis call."""
+    async def execute_command(self, *args, **options):
+        with timed("redis"):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+def _route(request) -> str:
+    # The route template (e.g. /users/me), so the metric labels stay bounded
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+async def middleware(request, call_next):
+    """
+    Collect per-request dependency stats: Prometheus metrics, a Server-Timing
+    header, and a sampled log line for slow requests.
+    """
+    stats = RequestStats()
+    token = _current.set(stats)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = stats.server_timing()
+        return response
+    finally:
+        _current.reset(token)
+        elapsed = stats.elapsed()
+        route = _route(request)
+        REQUEST_DURATION.labels(request.method, route, str(status)).observe(elapsed)
+        for dependency, (count, total) in stats.calls.items():
+            DEPENDENCY_CALLS.labels(dependency, route).inc(count)
+            DEPENDENCY_DURATION.labels(dependency, route).observe(total)
+        if elapsed * 1000 >= SLOW_REQUEST_MS and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+            print("Slow request:", json.dumps({
+                "method": request.method,
+                "path": request.url.path,
+                "route": route,
+                "status": status,
+                "ms": round(elapsed * 1000, 2),
+                "calls": stats.breakdown(),
+            }))
+
+def metrics() -> tuple:
+    """Prometheus exposition body and content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,69 @@
+"""
+Re-embed every user_vectors row produced by an older embedding model version.
+
+    cd backend
+    python -m jobs.reembed_stale --batch-size 256
+
+Rows are selected by model_version, re-encoded in large batches with the local
+model and written back with bulk upserts. Afterwards run a full recommendation
+refresh (the Lambda without --since), since every neighbourhood has moved.
+"""
+import argparse
+from services import embedding_service, user_service
+from supabase_client import supabase
+
+def fetch_stale_user_ids(limit: int) -> list:
+    current = embedding_service.MODEL_VERSION
+    response = supabase.table("user_vectors") \
+        .select("user_id") \
+        .or_(f'model_version.is.null,model_version.neq."{current}"') \
+        .order("user_id") \
+        .limit(limit) \
+        .execute()
+    return [row["user_id"] for row in response.data or []]
+
+def reembed(user_ids: list) -> int:
+    columns = "id, " + ", ".join(sorted(user_service.EMBEDDING_FIELDS))
+    response = supabase.table("User").select(columns).in_("id", user_ids).execute()
+    users = response.data or []
+    if not users:
+        return 0
+
+    texts = [user_service.build_embedding_text(user) for user in users]
+    embeddings = embedding_service.encode_local(texts)
+    supabase.table("user_vectors").upsert([
+        {
+            "user_id": user["id"],
+            "embedding": embedding.tolist(),
+            "fingerprint": embedding_service.fingerprint(text, embedding_service.MODEL_VERSION),
+            "model_version": embedding_service.MODEL_VERSION
+        }
+        for user, text, embedding in zip(users, texts, embeddings)
+    ], on_conflict="user_id").execute()
+    return len(users)
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed user_vectors rows from an older model version.")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"Re-embedding stale rows with model version {embedding_service.MODEL_VERSION}")
+    attempted = set()
+    total = 0
+    while True:
+        # Updated rows drop out of the stale set, so always read the first page
+        user_ids = [u for u in fetch_stale_user_ids(args.batch_size + len(attempted)) if u not in attempted]
+        if not user_ids:
+            break
+        user_ids = user_ids[:args.batch_size]
+        attempted.update(user_ids)
+        total += reembed(user_ids)
+        print(f"  re-embedded {total} users")
+
+    skipped = len(attempted) - total
+    print(f"Done: {total} re-embedded, {skipped} skipped (no matching user)")
+    if total:
+        print("Run a full recommendation refresh so neighbourhoods use the new embeddings.")
+
+if __name__ == "__main__":
+    main()
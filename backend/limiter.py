@@ -1,25 +1,46 @@
-import os, time
-from typing import Tuple, Callable
+import abc, asyncio, ipaddress, os, time, uuid
+from typing import Callable, List, NamedTuple, Sequence, Tuple
 from fastapi import Request, HTTPException
 from redis.asyncio import Redis
+from instrumentation import InstrumentedRedis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+def parse_networks(value: str) -> list:
+    """Parse comma-separated addresses or networks (e.g. "127.0.0.1,10.0.0.0/8")."""
+    return [ipaddress.ip_network(net.strip(), strict=False) for net in value.split(",") if net.strip()]
+
+def in_networks(address: str, networks: list) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in net for net in networks)
+
+# Peers whose X-Forwarded-For is believed when rate limiting by client address:
+# comma-separated addresses or networks. Defaults to the Next.js proxy on this host.
+TRUSTED_PROXIES = parse_networks(os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1"))
 
 # Shared Redis client (lazy singleton)
 _redis: Redis | None = None
 def get_redis() -> Redis:
     global _redis
     if _redis is None:
-        _redis = Redis.from_url(
-            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        # Commands are timed per request (see instrumentation.py)
+        _redis = InstrumentedRedis.from_url(
+            REDIS_URL,
             decode_responses=True
         )
     return _redis
 
-# Atomic token bucket
+# Atomic token bucket. Takes up to ARGV[4] tokens at once (default 1) so a
+# process can lease a batch; returns the number granted.
 TOKEN_BUCKET_LUA = """
--- KEYS[1] key ; ARGV[1] cap ; ARGV[2] rate/sec ; ARGV[3] now_ms
+-- KEYS[1] key ; ARGV[1] cap ; ARGV[2] rate/sec ; ARGV[3] now_ms ; ARGV[4] wanted
 local cap = tonumber(ARGV[1])
 local rate = tonumber(ARGV[2])
 local nowms = tonumber(ARGV[3])
+local want = tonumber(ARGV[4] or '1')
 
 local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
 local tokens = tonumber(data[1])
@@ -35,8 +56,8 @@ tokens = math.min(cap, tokens + delta * rate)
 local allowed = 0
 local retry_ms = 0
 if tokens >= 1.0 then
-  tokens = tokens - 1.0
-  allowed = 1
+  allowed = math.min(want, math.floor(tokens))
+  tokens = tokens - allowed
 else
   local need = 1.0 - tokens
   retry_ms = math.ceil((need / rate) * 1000.0)
@@ -49,33 +70,349 @@ redis.call('PEXPIRE', KEYS[1], idle_ms * 2)  -- free idle keys
 return {allowed, retry_ms, math.floor(tokens)}
 """
 
-class TokenBucket:
-    def __init__(self, redis: Redis, capacity: int, refill_per_sec: float, prefix: str = "rl"):
+
+# Multi-key scripts used by allow_many. Every key is checked first and tokens are
+# only taken if all of them allow the request, so a denied call costs nothing.
+# ARGV[1] now_ms ; ARGV[2] nonce ; then a fixed number of parameters per key.
+# Each returns {allowed, retry_ms, lowest remaining}.
+TOKEN_BUCKET_MULTI_LUA = """
+-- per key: cap, rate/sec
+local now = tonumber(ARGV[1])
+local state = {}
+local allowed = 1
+local retry = 0
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[1 + 2 * i])
+  local rate = tonumber(ARGV[2 + 2 * i])
+  local data = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local tokens = tonumber(data[1])
+  local ts = tonumber(data[2])
+  if not tokens or not ts then
+    tokens = cap
+    ts = now
+  end
+  tokens = math.min(cap, tokens + (now - ts) / 1000.0 * rate)
+  if tokens < 1.0 then
+    allowed = 0
+    retry = math.max(retry, math.ceil((1.0 - tokens) / rate * 1000.0))
+  end
+  state[i] = tokens
+end
+
+local remaining = 0
+if allowed == 1 then
+  remaining = -1
+  for i = 1, #KEYS do
+    local cap = tonumber(ARGV[1 + 2 * i])
+    local rate = tonumber(ARGV[2 + 2 * i])
+    local tokens = state[i] - 1.0
+    redis.call('HMSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil((cap / rate) * 1000.0) * 2)
+    if remaining < 0 or tokens < remaining then
+      remaining = math.floor(tokens)
+    end
+  end
+end
+return {allowed, retry, remaining}
+"""
+
+# Generic cell rate algorithm: one key holding the theoretical arrival time
+# (TAT) in ms, instead of the token bucket's tokens/ts hash.
+GCRA_MULTI_LUA = """
+-- per key: emission interval ms, tolerance ms (emission * burst)
+local now = tonumber(ARGV[1])
+local state = {}
+local allowed = 1
+local retry = 0
+for i = 1, #KEYS do
+  local emission = tonumber(ARGV[1 + 2 * i])
+  local tolerance = tonumber(ARGV[2 + 2 * i])
+  local tat = tonumber(redis.call('GET', KEYS[i]) or '0')
+  if tat < now then
+    tat = now
+  end
+  local new_tat = tat + emission
+  local allow_at = new_tat - tolerance
+  if now < allow_at then
+    allowed = 0
+    retry = math.max(retry, math.ceil(allow_at - now))
+  end
+  state[i] = new_tat
+end
+
+local remaining = 0
+if allowed == 1 then
+  remaining = -1
+  for i = 1, #KEYS do
+    local emission = tonumber(ARGV[1 + 2 * i])
+    local tolerance = tonumber(ARGV[2 + 2 * i])
+    redis.call('SET', KEYS[i], state[i], 'PX', math.max(1, math.ceil(state[i] - now)))
+    local left = math.floor((now - (state[i] - tolerance)) / emission)
+    if remaining < 0 or left < remaining then
+      remaining = left
+    end
+  end
+end
+return {allowed, retry, remaining}
+"""
+
+# Sliding-window log: one sorted-set entry per allowed request, scored by time.
+# Exact, at the cost of memory proportional to the limit.
+SLIDING_WINDOW_MULTI_LUA = """
+-- per key: limit, window ms
+local now = tonumber(ARGV[1])
+local state = {}
+local allowed = 1
+local retry = 0
+for i = 1, #KEYS do
+  local limit = tonumber(ARGV[1 + 2 * i])
+  local window = tonumber(ARGV[2 + 2 * i])
+  redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - window)
+  local count = redis.call('ZCARD', KEYS[i])
+  if count >= limit then
+    allowed = 0
+    local oldest = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+    local wait = window
+    if oldest[2] then
+      wait = math.ceil(tonumber(oldest[2]) + window - now)
+    end
+    retry = math.max(retry, wait)
+  end
+  state[i] = count
+end
+
+local remaining = 0
+if allowed == 1 then
+  remaining = -1
+  for i = 1, #KEYS do
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local window = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZADD', KEYS[i], now, ARGV[2] .. ':' .. i)
+    redis.call('PEXPIRE', KEYS[i], window)
+    local left = limit - state[i] - 1
+    if remaining < 0 or left < remaining then
+      remaining = left
+    end
+  end
+end
+return {allowed, retry, remaining}
+"""
+
+class RateLimiter(abc.ABC):
+    """
+    Base class for Redis-backed limiters. Subclasses set `kind` (part of the key),
+    `MULTI_LUA` (a script in the allow_many format above) and key_args().
+    Keys are `{prefix}:{kind}:{scope}:{identity}`; the scope is a Redis Cluster
+    hash tag, so one allow_many call may only mix scopes on a single-node Redis.
+    """
+    kind = ""
+    MULTI_LUA = ""
+
+    def __init__(self, redis: Redis, prefix: str = "rl"):
         self.redis = redis
-        self.capacity = int(capacity)
-        self.refill = float(refill_per_sec)
         self.prefix = prefix
+        self._multi = redis.register_script(self.MULTI_LUA)
 
     def key(self, scope: str, identity: str) -> str:
         # {scope} = Redis Cluster hash-tag (safe even if not clustering)
-        return f"{self.prefix}:tb:{{{scope}}}:{identity}"
+        return f"{self.prefix}:{self.kind}:{{{scope}}}:{identity}"
+
+    @abc.abstractmethod
+    def key_args(self) -> list:
+        """Per-key script parameters, in MULTI_LUA's order."""
 
     async def allow(self, scope: str, identity: str) -> Tuple[bool, float, int]:
+        return await self.allow_many([(scope, identity)])
+
+    async def allow_many(self, checks: Sequence[Tuple[str, str]]) -> Tuple[bool, float, int]:
+        """
+        Check several (scope, identity) buckets in one script call.
+        Allowed only if every bucket allows it; returns the longest retry and the lowest remaining.
+        """
+        return await allow_many([(self, scope, identity) for scope, identity in checks])
+
+class TokenBucket(RateLimiter):
+    """
+    Redis token bucket shared by every process.
+    With lease_size > 1 each process takes up to lease_size tokens per round trip
+    and spends them locally, going back to Redis only when its lease is used up
+    or older than lease_ttl_ms. Leased tokens that expire unused are dropped, so
+    leasing can only make the limit stricter, never looser; lease_size=1 (the
+    default) is exact and checks Redis on every call. allow_many never leases.
+    """
+    kind = "tb"
+    MULTI_LUA = TOKEN_BUCKET_MULTI_LUA
+
+    def __init__(
+        self,
+        redis: Redis,
+        capacity: int,
+        refill_per_sec: float,
+        prefix: str = "rl",
+        lease_size: int = 1,
+        lease_ttl_ms: int = 1000,
+        max_local_keys: int = 10000,
+    ):
+        super().__init__(redis, prefix)
+        self.capacity = int(capacity)
+        self.refill = float(refill_per_sec)
+        self.lease_size = max(1, min(int(lease_size), self.capacity))
+        self.lease_ttl = lease_ttl_ms / 1000.0
+        self.max_local_keys = max_local_keys
+        # Sent with EVALSHA; redis-py reloads it if the server's script cache was flushed
+        self._script = redis.register_script(TOKEN_BUCKET_LUA)
+        # key -> (leased tokens left, lease expiry on the monotonic clock,
+        # tokens left in the Redis bucket when the lease was taken)
+        self._leases = {}
+
+    def key_args(self) -> list:
+        return [self.capacity, self.refill]
+
+    async def _take(self, key: str, wanted: int) -> Tuple[int, float, int]:
         now_ms = int(time.time() * 1000)
-        allowed, retry_ms, tokens = await self.redis.eval(
-            TOKEN_BUCKET_LUA, 1,
-            self.key(scope, identity),
-            self.capacity, self.refill, now_ms
+        granted, retry_ms, tokens = await self._script(
+            keys=[key], args=[self.capacity, self.refill, now_ms, wanted]
         )
-        return bool(int(allowed)), int(retry_ms) / 1000.0, int(tokens)
+        return int(granted), int(retry_ms) / 1000.0, int(tokens)
+
+    async def allow(self, scope: str, identity: str) -> Tuple[bool, float, int]:
+        key = self.key(scope, identity)
+        if self.lease_size == 1:
+            granted, retry_after, tokens = await self._take(key, 1)
+            return granted > 0, retry_after, tokens
+
+        now = time.monotonic()
+        # remaining is always the local lease left after this request plus the
+        # Redis bucket as of the last round trip
+        left, expires, server_tokens = self._leases.get(key, (0, 0.0, 0))
+        if left > 0 and now < expires:
+            self._leases[key] = (left - 1, expires, server_tokens)
+            return True, 0.0, left - 1 + server_tokens
+
+        granted, retry_after, tokens = await self._take(key, self.lease_size)
+        if granted == 0:
+            self._leases.pop(key, None)
+            return False, retry_after, tokens
+        if len(self._leases) >= self.max_local_keys:
+            self._prune(now)
+        self._leases[key] = (granted - 1, now + self.lease_ttl, tokens)
+        return True, 0.0, granted - 1 + tokens
+
+    def _prune(self, now: float) -> None:
+        for key, (left, expires, _) in list(self._leases.items()):
+            if left == 0 or now >= expires:
+                del self._leases[key]
+        # Still full of live leases: drop the oldest (dicts keep insertion order)
+        while len(self._leases) >= self.max_local_keys:
+            del self._leases[next(iter(self._leases))]
+
+class GCRA(RateLimiter):
+    """
+    Generic cell rate algorithm with token-bucket semantics (bursts of up to
+    `capacity`, refilled at refill_per_sec) stored as a single timestamp per key.
+    """
+    kind = "gcra"
+    MULTI_LUA = GCRA_MULTI_LUA
+
+    def __init__(self, redis: Redis, capacity: int, refill_per_sec: float, prefix: str = "rl"):
+        super().__init__(redis, prefix)
+        self.capacity = int(capacity)
+        self.refill = float(refill_per_sec)
+
+    def key_args(self) -> list:
+        emission_ms = 1000.0 / self.refill
+        return [emission_ms, emission_ms * self.capacity]
+
+class SlidingWindowLog(RateLimiter):
+    """
+    At most `limit` requests in any window of window_seconds, counted exactly.
+    """
+    kind = "swl"
+    MULTI_LUA = SLIDING_WINDOW_MULTI_LUA
+
+    def __init__(self, redis: Redis, limit: int, window_seconds: float, prefix: str = "rl"):
+        super().__init__(redis, prefix)
+        self.limit = int(limit)
+        self.window_ms = int(window_seconds * 1000)
+
+    def key_args(self) -> list:
+        return [self.limit, self.window_ms]
+
+async def _run_group(group: List[Tuple[RateLimiter, str, str]]) -> Tuple[bool, float, int]:
+    keys = []
+    args = [int(time.time() * 1000), uuid.uuid4().hex]
+    for limiter, scope, identity in group:
+        keys.append(limiter.key(scope, identity))
+        args.extend(limiter.key_args())
+    allowed, retry_ms, remaining = await group[0][0]._multi(keys=keys, args=args)
+    return bool(int(allowed)), int(retry_ms) / 1000.0, int(remaining)
+
+async def allow_many(checks: Sequence[Tuple[RateLimiter, str, str]]) -> Tuple[bool, float, int]:
+    """
+    Evaluate several (limiter, scope, identity) checks together.
+    Checks using the same algorithm run in a single script call and are
+    all-or-nothing; different algorithms run concurrently, one call each.
+    """
+    groups = {}
+    for check in checks:
+        groups.setdefault(type(check[0]), []).append(check)
+    results = await asyncio.gather(*(_run_group(group) for group in groups.values()))
+    return (
+        all(allowed for allowed, _, _ in results),
+        max(retry for _, retry, _ in results),
+        min(remaining for _, _, remaining in results),
+    )
 
 # FastAPI helper ---
-def rate_limit(scope: str, bucket: TokenBucket) -> Callable:
+class Limit(NamedTuple):
+    scope: str
+    limiter: RateLimiter
+    # "user" (the verified access token's subject, else client IP), "ip", or "global".
+    # Limits sharing a scope share a Redis Cluster slot, so they stay in one script call.
+    by: str = "user"
+
+def _trusted(address: str) -> bool:
+    return in_networks(address, TRUSTED_PROXIES)
+
+def client_ip(req: Request) -> str:
+    """
+    The address of the client behind any trusted proxies: the right-most
+    X-Forwarded-For entry not added by a trusted proxy. The header is ignored
+    unless the direct peer is itself trusted, so clients cannot spoof it.
+    """
+    peer = req.client.host if req.client else ""
+    if not _trusted(peer):
+        return peer
+    hops = [hop.strip() for hop in req.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def _identity(req: Request, by: str) -> str:
+    if by == "global":
+        return "all"
+    ip = client_ip(req)
+    if by == "ip":
+        return f"ip:{ip}"
+    # Imported on use: importing the limiter (as cache.py does) must not read the JWT settings
+    from auth import user_from_token
+    scheme, _, token = req.headers.get("authorization", "").partition(" ")
+    user = user_from_token(token) if scheme.lower() == "bearer" and token else None
+    return f"user:{user['user_id']}" if user else f"anon:{ip}"
+
+def rate_limit(*limits: Limit) -> Callable:
+    """
+    Dependency enforcing every limit, e.g.
+    Depends(rate_limit(Limit("signin", ip_limiter, "ip"), Limit("signin", global_limiter, "global"))).
+    Limits of the same algorithm are checked in one all-or-nothing script call;
+    each further algorithm costs another call that spends its tokens even when
+    another algorithm denies, so keep an endpoint's limits to one algorithm.
+    """
     async def _dep(req: Request):
-        # Prefer user id if available (e.g., after auth), else IP
-        uid = req.headers.get("x-user-id")
-        identity = f"user:{uid}" if uid else f"ip:{req.client.host}"
-        allowed, retry_after, remaining = await bucket.allow(scope, identity)
+        allowed, retry_after, remaining = await allow_many(
+            [(limit.limiter, limit.scope, _identity(req, limit.by)) for limit in limits]
+        )
         if not allowed:
             raise HTTPException(
                 status_code=429,
@@ -83,4 +420,4 @@ def rate_limit(scope: str, bucket: TokenBucket) -> Callable:
                 headers={"Retry-After": str(max(1, int(round(retry_after))))}
             )
         req.state.rate_remaining = remaining  # optional
-    return _dep
\ No newline at end of file
+    return _dep
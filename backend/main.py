@@ -1,19 +1,27 @@
-from auth import get_current_user
+from auth import get_current_user, user_from_token
 from services import jwt_service
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Response
 from pydantic import BaseModel
-from passlib.context import CryptContext
-from jose import jwt
+from jose import JWTError
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List
-from services import user_service, jwt_service, like_service, match_service
-from supabase_client import supabase
+from services import user_service, jwt_service, like_service, match_service, message_service, password_service, image_service
+from services.match_events import USER_ROOM_PREFIX, MatchEventTailer, user_room
+from services.message_pipeline import MessagePipeline
+from services.presence import RoomPresence
+from services.room_flush import RoomFlushScheduler, RoomSequencer
+from supabase_client import get_async_supabase, close_async_supabase
+from contextlib import asynccontextmanager
 from fastapi import Depends, Body
 import uuid
 import os
 import socketio
-from dateutil.parser import isoparse
-from limiter import get_redis, TokenBucket
+from limiter import get_redis, in_networks, parse_networks, GCRA, Limit, SlidingWindowLog, TokenBucket, rate_limit, REDIS_URL
+from fastapi.responses import JSONResponse
+import responses
+from responses import ORJSONResponse
+import cache
+import instrumentation
 
 # Simple URL validation functions
 def validate_social_url(url: str, platform: str) -> bool:
@@ -44,18 +52,64 @@ def normalize_url(url: str) -> str:
     url = url.strip()
     return url if url.startswith(('http://', 'https://')) else f'https://{url}'
 
+# Rooms and emits are shared across every worker and host through Redis pub/sub.
+# Websocket-only transport means any node can serve any request, so no sticky sessions are needed.
 sio = socketio.AsyncServer(
     async_mode='asgi',
-    cors_allowed_origins=['http://localhost:3000']
+    cors_allowed_origins=['http://localhost:3000'],
+    client_manager=socketio.AsyncRedisManager(REDIS_URL),
+    transports=os.getenv("SOCKETIO_TRANSPORTS", "websocket").split(",")
 )
 
-chat_bucket = TokenBucket(get_redis(), capacity=10, refill_per_sec=0.5)
+# Cluster-wide socket counts per chat room
+room_presence = RoomPresence(get_redis())
+
+# Per-room sequence numbers, delivery acks, and (opt-in, CHAT_COALESCE_MS > 0)
+# coalescing of messages sent within a short window into one receiveMessages frame.
+# A lost sequence counter is re-seeded from the highest seq in the database.
+room_sequencer = RoomSequencer(get_redis(), load_max_seq=message_service.get_max_seq)
+room_flush = RoomFlushScheduler(sio.emit, window_ms=float(os.getenv("CHAT_COALESCE_MS", "0")))
+
+chat_bucket = TokenBucket(
+    get_redis(), capacity=10, refill_per_sec=0.5,
+    lease_size=int(os.getenv("CHAT_RATE_LEASE", "1"))
+)
+
+# HTTP limits. An endpoint's limits share its scope and algorithm, so they are
+# checked together in one all-or-nothing Redis call (see limiter.rate_limit).
+auth_ip_limiter = GCRA(get_redis(), capacity=10, refill_per_sec=10 / 60)
+auth_global_limiter = GCRA(get_redis(), capacity=200, refill_per_sec=50)
+# Bursts of 5 signups per address, then one every 12 minutes (5 an hour)
+signup_ip_limiter = GCRA(get_redis(), capacity=5, refill_per_sec=5 / 3600)
+like_user_limiter = GCRA(get_redis(), capacity=30, refill_per_sec=1)
+like_ip_limiter = GCRA(get_redis(), capacity=120, refill_per_sec=4)
+like_bulk_limiter = GCRA(get_redis(), capacity=5, refill_per_sec=0.1)
+upload_user_limiter = SlidingWindowLog(get_redis(), limit=10, window_seconds=60)
+
+# Chat messages are persisted write-behind, in batches, off the sendMessage path
+message_pipeline = MessagePipeline(get_redis())
+# Namespace for message ids derived from (sender, client-supplied id)
+MESSAGE_ID_NAMESPACE = uuid.UUID("5b0f3c1e-8f4a-4d3b-9a57-3f1f0d6c2a91")
+
+# Pushes matchCreated to both users' user:<id> rooms from the match_events outbox,
+# so clients don't have to poll /matches to notice new matches
+match_events = MatchEventTailer(sio.emit, poll_interval_ms=int(os.getenv("MATCH_EVENTS_POLL_MS", "1000")))
 
 # Define the request body model for sign up and sign in
 class SignUpOrInRequest(BaseModel):
     email: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class QueuedLike(BaseModel):
+    likee_id: str
+    liked_at: Optional[str] = None
+
+class BulkLikeRequest(BaseModel):
+    likes: List[QueuedLike]
+
 # Define the request body model for user updates during onboarding
 class UserUpdateRequest(BaseModel):
     first_name: Optional[str] = None
@@ -92,24 +146,119 @@ class PeopleResponse(BaseModel):
     github_url: Optional[str] = None
     twitter_url: Optional[str] = None
 
+async def resource_etag(versions: cache.VersionStamps, ident: str, *parts) -> Optional[str]:
+    """
+    ETag for one user's (or room's) view of a resource: its version stamp plus
+    the query parameters that shape the body. None when Redis is unavailable.
+    """
+    stamp = await versions.get(ident)
+    return responses.etag(versions.namespace, ident, stamp, *parts) if stamp else None
+
+# PeopleResponse fields that are sent as "" rather than null
+PEOPLE_OPTIONAL_FIELDS = ("bio", "image_url", "linkedin_url", "github_url", "twitter_url")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled async Supabase connection up front instead of on the first request
+    await get_async_supabase()
+    await message_pipeline.start()
+    room_presence.start()
+    match_events.start()
+    yield
+    await match_events.stop()
+    await room_presence.stop()
+    await room_flush.flush_all()
+    # Flush queued chat messages and embedding refreshes before the worker exits
+    await message_pipeline.drain(timeout=30)
+    await user_service.refresh_queue.join(timeout=30)
+    await close_async_supabase()
+    password_service.shutdown()
+    image_service.shutdown()
+
 # Create a FastAPI app instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Per-request Supabase/Redis/embedding/bcrypt breakdown: Server-Timing header,
+# Prometheus metrics at /metrics, and a sampled slow-request log
+app.middleware("http")(instrumentation.middleware)
+
+@app.exception_handler(password_service.PasswordPoolBusy)
+async def password_pool_busy_handler(request, exc):
+    # Shed load quickly instead of queueing logins behind a saturated bcrypt pool
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts in progress. Try again shortly."},
+        headers={"Retry-After": "1"}
+    )
 
 @sio.event
-async def connect(sid, environ):
-    print("Socket connected:", sid)
+async def connect(sid, environ, auth=None):
+    """
+    Sockets that connect with {token: <access token>} as their auth join their
+    user's user:<id> room, where per-user events such as matchCreated are sent.
+    Only authenticated sockets can send messages, as the user in their session.
+    """
+    user = user_from_token(auth["token"]) if isinstance(auth, dict) and auth.get("token") else None
+    if user:
+        await sio.save_session(sid, {"user_id": user["user_id"]})
+        await sio.enter_room(sid, user_room(user["user_id"]))
+    print("Socket connected:", sid, "as " + user["user_id"] if user else "anonymously")
 
 @sio.event
-async def joinRoom(sid, room_id):
+async def joinRoom(sid, data):
+    """
+    Join a chat room. Accepts the room id or {roomId}; only authenticated sockets
+    of the match's two users may join. Returns the room's latest sequence number
+    and the user's last acked one, so a reconnecting client can fetch just the
+    gap from /messages.
+    """
+    room_id = data.get("roomId") if isinstance(data, dict) else data
+    user_id = (await sio.get_session(sid)).get("user_id")
+    if not user_id:
+        return {"error": "Not authenticated"}
+    # Sockets only enter their own user room, on connect
+    if not isinstance(room_id, str) or room_id.startswith(USER_ROOM_PREFIX):
+        return {"error": "Not a member of this room"}
+    if not await match_service.is_match_member(room_id, user_id):
+        return {"error": "Not a member of this room"}
+
     await sio.enter_room(sid, room_id)
+    count = await room_presence.join(room_id, sid)
+    await sio.emit("presence", {"roomId": room_id, "count": count}, room=room_id)
     print(f"Socket {sid} joined room {room_id}")
 
+    return {
+        "seq": await room_sequencer.current(room_id),
+        "lastAcked": await room_sequencer.last_acked(room_id, user_id)
+    }
+
 @sio.event
-async def sendMessage(sid, data):
-    sender = data["from"]
-    room_id = data["roomId"]
-    if not sender or not room_id:
+async def ackMessages(sid, data):
+    """
+    Record that the socket's user has received every message in a room up to data["seq"].
+    """
+    user_id = (await sio.get_session(sid)).get("user_id")
+    if not user_id or data.get("seq") is None or not await match_service.is_match_member(data.get("roomId"), user_id):
+        return
+    return {"lastAcked": await room_sequencer.ack(data["roomId"], user_id, data["seq"])}
+
+@sio.event
+async def leaveRoom(sid, room_id):
+    # Only rooms joined through joinRoom's membership check are counted
+    if not room_presence.has(room_id, sid):
         return
+    await sio.leave_room(sid, room_id)
+    count = await room_presence.leave(room_id, sid)
+    await sio.emit("presence", {"roomId": room_id, "count": count}, room=room_id)
+
+@sio.event
+async def sendMessage(sid, data):
+    sender = (await sio.get_session(sid)).get("user_id")
+    room_id = data.get("roomId")
+    if not sender or data.get("from") not in (None, sender):
+        return {"error": "Not authenticated"}
+    if not isinstance(data.get("message"), str) or not data["message"]:
+        return {"error": "Empty message"}
 
     scope = "chat-send"
     identity = f"user:{sender}"
@@ -119,55 +268,85 @@ async def sendMessage(sid, data):
         await sio.emit("rate_limited", {"retryAfter": retry_after}, room=sid)
         return
 
-    res= supabase.table("Messages").insert({
-        "match_id":  data["roomId"],
-        "sender_id": data["from"],
+    # Anything queued here must be insertable, or it would hold up the rows behind it
+    if not await match_service.is_match_member(room_id, sender):
+        return {"error": "Not a member of this room"}
+
+    # Clients may supply their own id so a resend after reconnect is deduplicated.
+    # The stored id is derived from it and the sender, so one client's ids can
+    # never collide with (and suppress) another's messages.
+    client_id = data.get("id")
+    message_id = str(uuid.uuid5(MESSAGE_ID_NAMESPACE, f"{sender}:{client_id}")) if client_id else str(uuid.uuid4())
+    sent_at = datetime.now(timezone.utc)
+    seq = await room_sequencer.next(room_id)
+    await message_pipeline.append({
+        "message_id": message_id,
+        "match_id":  room_id,
+        "sender_id": sender,
         "content":   data["message"],
-        "sent_at":   datetime.now(timezone.utc).isoformat()
-    }).execute()
-
-    await sio.emit("receiveMessage", data, room=data["roomId"])
+        "sent_at":   sent_at.isoformat(),
+        "seq":       seq
+    })
+
+    data["id"] = message_id
+    data["from"] = sender
+    data["seq"] = seq
+    data["timestamp"] = int(sent_at.timestamp() * 1000)
+    await room_flush.publish(room_id, data)
+    # Delivery ack for the sender
+    return {"id": message_id, "seq": seq}
 
 @sio.event
-def disconnect(sid):
+async def disconnect(sid):
+    # Rooms are still attached to the sid while this handler runs
+    for room_id in sio.rooms(sid):
+        # Skip the sid's own room and user rooms, which have no presence
+        if room_id == sid or room_id.startswith(USER_ROOM_PREFIX) or not room_presence.has(room_id, sid):
+            continue
+        count = await room_presence.leave(room_id, sid)
+        await sio.emit("presence", {"roomId": room_id, "count": count}, room=room_id, skip_sid=sid)
     print("Socket disconnected:", sid)
 
-# Password hashing context using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 """
 Sign up a new user with email and password.
 Password is hashed before storing.
 Returns a success message if the email is not taken.
 """
-@app.post("/signup", status_code=201)
-def sign_up(request: SignUpOrInRequest):
+@app.post("/signup", status_code=201, dependencies=[Depends(rate_limit(
+    Limit("signup", signup_ip_limiter, "ip"),
+    Limit("signup", auth_global_limiter, "global")
+))])
+async def sign_up(request: SignUpOrInRequest):
     # Check if the email already exists using user_service
-    existing_user = user_service.get_user_by_email(request.email)
+    existing_user = await user_service.get_user_by_email(request.email, columns="id")
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already exists")
     
     # Hash the password before storing
-    hashed_password = pwd_context.hash(request.password)
+    hashed_password = await password_service.hash_password(request.password)
     # Store the user with hashed password
-    data = user_service.insert_user(request.email, hashed_password)
+    data = await user_service.insert_user(request.email, hashed_password)
 
     user_id = data.data[0]['id']
 
-    # Create JWT token
-    token = jwt_service.create_jwt_token(user_id)
+    # Create JWT tokens
+    token = jwt_service.create_jwt_token(user_id, jwt_service.compact_claims(data.data[0]))
+    refresh_token = jwt_service.create_refresh_token(user_id, data.data[0].get("token_version"))
 
     # Return success message with JWT token
-    return {"message": "Sign up successful", "access_token": token, "token_type": "bearer"}
+    return {"message": "Sign up successful", "access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 """
 Sign in a user by verifying email and password.
 Returns a JWT if authentication is successful.
 """
-@app.post("/signin", status_code=200)
-def sign_in(request: SignUpOrInRequest):
+@app.post("/signin", status_code=200, dependencies=[Depends(rate_limit(
+    Limit("signin", auth_ip_limiter, "ip"),
+    Limit("signin", auth_global_limiter, "global")
+))])
+async def sign_in(request: SignUpOrInRequest):
     # Check if the user exists
-    user = user_service.get_user_by_email(request.email)
+    user = await user_service.get_user_by_email(request.email, columns=user_service.SIGNIN_COLUMNS)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
@@ -176,20 +355,71 @@ def sign_in(request: SignUpOrInRequest):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify the password
-    if not pwd_context.verify(request.password, hashed_password):
+    valid, new_hash = await password_service.verify_and_update(request.password, hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     user_id = user.get("id")
-    # Create JWT token
-    token = jwt_service.create_jwt_token(user_id)
-    return {"access_token": token, "token_type": "bearer"}
+    if new_hash:
+        # Stored hash used outdated bcrypt parameters; replace it while we have the password
+        try:
+            await user_service.update_user_by_id(user_id, {"password": new_hash})
+        except Exception as e:
+            print("Failed to rehash password:", e)
+
+    # Create JWT tokens
+    token = jwt_service.create_jwt_token(user_id, jwt_service.compact_claims(user))
+    refresh_token = jwt_service.create_refresh_token(user_id, user.get("token_version"))
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+"""
+Exchange a refresh token for a new access token (and a new refresh token).
+Each refresh token can be used once, and only while its version matches the
+user's token_version, which a password change bumps.
+"""
+@app.post("/token/refresh", status_code=200, dependencies=[Depends(rate_limit(
+    Limit("token-refresh", auth_ip_limiter, "ip")
+))])
+async def refresh_access_token(request: RefreshRequest):
+    try:
+        payload = jwt_service.decode_token(request.refresh_token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    if payload.get("typ") != "refresh" or not payload.get("sub") or not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    # Read uncached so a revocation applies immediately
+    user_id = payload["sub"]
+    current = await user_service.get_user_by_id(user_id, columns="id, token_version")
+    if not current:
+        raise HTTPException(status_code=401, detail="User not found")
+    version = current.get("token_version") or 0
+    if payload.get("ver", 0) != version:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+
+    # Rotate: remember the jti until the token would have expired anyway
+    ttl = max(1, int(payload["exp"] - datetime.now(timezone.utc).timestamp()))
+    if not await get_redis().set(f"auth:refresh:used:{payload['jti']}", 1, nx=True, ex=ttl):
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+
+    user = await user_service.get_user_profile_cached(user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    token = jwt_service.create_jwt_token(user_id, jwt_service.compact_claims(user))
+    refresh_token = jwt_service.create_refresh_token(user_id, version)
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 """
 Get current user's profile information.
 Returns the user's profile data including onboarding status.
 """
 @app.get("/users/me", status_code=200)
-def get_current_user_profile(current_user: dict = Depends(get_current_user)):
+async def get_current_user_profile(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
     """
     Get current user's profile information.
     Returns user data including has_onboarded status.
@@ -200,14 +430,16 @@ def get_current_user_profile(current_user: dict = Depends(get_current_user)):
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Get user data
-        user = user_service.get_user_by_id(user_id)
-        if not user:
+        etag = await resource_etag(cache.profile_versions, user_id)
+        if responses.is_fresh(request, etag):
+            return responses.not_modified(etag)
+
+        # Get user data (cached, without the password hash)
+        user_data = await user_service.get_user_profile_cached(user_id)
+        if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Remove sensitive information
-        user_data = {key: value for key, value in user.items() if key != "password"}
-        
+        response.headers.update(responses.validator_headers(etag))
         return user_data
         
     except Exception as e:
@@ -217,65 +449,42 @@ def get_current_user_profile(current_user: dict = Depends(get_current_user)):
 Upload profile image to Supabase Storage and return public URL.
 Accepts image file and returns the public URL to store in database.
 """
-@app.post("/upload-image", status_code=200)
+@app.post("/upload-image", status_code=200, dependencies=[Depends(rate_limit(
+    Limit("upload-image", upload_user_limiter, "user")
+))])
 async def upload_image(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Upload image to Supabase Storage and return public URL.
+    Upload an image, store resized WebP variants of it (full, card, avatar) and
+    return their public URLs. image_url is the full variant; the API swaps in
+    the smaller ones where it returns images for cards and avatars.
     """
     try:
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Read file content
-        content = await file.read()
-        
-        # Validate file size (max 5MB)
-        if len(content) > 5 * 1024 * 1024:  # 5MB limit
-            raise HTTPException(status_code=400, detail="File size must be less than 5MB")
-        
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = f"profiles/{unique_filename}"
-        
-        # Upload to Supabase Storage
+
+        # Read in chunks, giving up as soon as the upload passes the size limit
         try:
-            result = supabase.storage.from_('profile-images').upload(file_path, content)
-            
-            if hasattr(result, 'error') and result.error:
-                raise HTTPException(status_code=500, detail=f"Failed to upload image: {result.error}")
-        except Exception as upload_error:
-            raise HTTPException(status_code=500, detail=f"Upload failed: {str(upload_error)}")
-        
-        # Get public URL
+            content, digest = await image_service.read_upload(file)
+        except image_service.ImageTooLarge:
+            raise HTTPException(status_code=413, detail="File size must be less than 5MB")
+
+        # Variants are stored under the content hash, so re-uploading the same image reuses them
         try:
-            public_url_result = supabase.storage.from_('profile-images').get_public_url(file_path)
-            
-            # Handle different possible response formats
-            if isinstance(public_url_result, dict):
-                image_url = public_url_result.get('publicURL') or public_url_result.get('publicUrl')
-            elif hasattr(public_url_result, 'get'):
-                image_url = public_url_result.get('publicURL') or public_url_result.get('publicUrl')
-            else:
-                # Sometimes it might return the URL directly as a string
-                image_url = str(public_url_result)
-                
-            if not image_url:
-                raise HTTPException(status_code=500, detail="Failed to get public URL")
-            
-            return {
-                "message": "Image uploaded successfully",
-                "image_url": image_url,
-                "file_path": file_path
-            }
-            
-        except Exception as url_error:
-            raise HTTPException(status_code=500, detail=f"Failed to get public URL: {str(url_error)}")
-        
+            urls = await image_service.store_image(content, digest)
+        except image_service.InvalidImage:
+            raise HTTPException(status_code=400, detail="File must be an image")
+
+        return {
+            "message": "Image uploaded successfully",
+            "image_url": urls[image_service.DEFAULT_VARIANT],
+            "image_variants": urls,
+            "file_path": image_service.variant_path(digest)
+        }
+
     except HTTPException:
         raise
     except Exception as e:
@@ -287,7 +496,7 @@ Accepts any combination of user fields and updates them in the database.
 Can be called multiple times to progressively update user information.
 """
 @app.patch("/users/update", status_code=200)
-def update_user_info(request: UserUpdateRequest, current_user: dict = Depends(get_current_user)):
+async def update_user_info(request: UserUpdateRequest, current_user: dict = Depends(get_current_user)):
     """
     Update user information during onboarding and profile management.
     Handles password changes, email updates, and regular profile updates.
@@ -298,8 +507,11 @@ def update_user_info(request: UserUpdateRequest, current_user: dict = Depends(ge
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Check if user exists
-        existing_user = user_service.get_user_by_id(user_id)
+        # Check if user exists; the password hash is only fetched for a password change
+        existing_user = await user_service.get_user_by_id(
+            user_id,
+            columns=user_service.PROFILE_WITH_PASSWORD_COLUMNS if request.password else user_service.PROFILE_COLUMNS
+        )
         if not existing_user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -310,15 +522,16 @@ def update_user_info(request: UserUpdateRequest, current_user: dict = Depends(ge
             if not stored_password:
                 raise HTTPException(status_code=400, detail="Current password not found")
             
-            if not pwd_context.verify(request.current_password, stored_password):
+            if not await password_service.verify_password(request.current_password, stored_password):
                 raise HTTPException(status_code=400, detail="Current password is incorrect")
             
             # Hash the new password
-            hashed_new_password = pwd_context.hash(request.password)
+            hashed_new_password = await password_service.hash_password(request.password)
             
-            # Update password in database
-            password_update_data = {"password": hashed_new_password}
-            user_service.update_user_by_id(user_id, password_update_data)
+            # Update password in database, revoking every refresh token issued so far
+            token_version = (existing_user.get("token_version") or 0) + 1
+            password_update_data = {"password": hashed_new_password, "token_version": token_version}
+            await user_service.update_user_by_id(user_id, password_update_data)
         
         elif request.password and not request.current_password:
             raise HTTPException(status_code=400, detail="Current password is required to change password")
@@ -353,58 +566,92 @@ def update_user_info(request: UserUpdateRequest, current_user: dict = Depends(ge
         # Update other user information if there's data to update
         updated_user = existing_user
         if update_data:
-            updated_user = user_service.update_user_by_id(user_id, update_data)
-
-        # Handle onboarding completion
-        if updated_user.get("has_onboarded"):
-            # Embed the user and add their embedding to the user_vectors table and add the results to the recommendations table.    
-            user_service.embed_user_and_add_to_recommendations(updated_user)
+            updated_user = await user_service.update_user_by_id(user_id, update_data)
+
+        # Handle onboarding completion and edits to embedded profile fields
+        if updated_user.get("has_onboarded") and (
+            "has_onboarded" in update_data or user_service.EMBEDDING_FIELDS.intersection(update_data)
+        ):
+            # Embed the user and refresh their recommendations in the background; this is
+            # a no-op when the profile text's fingerprint matches the stored embedding.
+            user_service.schedule_embedding_refresh(updated_user)
         
         # Build response message
         updated_fields = list(update_data.keys())
         if request.password and request.current_password:
             updated_fields.append("password")
         
-        return {
+        result = {
             "message": "User information updated successfully",
             "updated_fields": updated_fields,
-            "user": {key: value for key, value in updated_user.items() if key != "password"}  # Don't return password
+            # Don't return the password hash or token version
+            "user": {key: value for key, value in updated_user.items() if key not in ("password", "token_version")},
+            # Access token carrying the updated profile claims
+            "access_token": jwt_service.create_jwt_token(user_id, jwt_service.compact_claims(updated_user))
         }
+        if request.password and request.current_password:
+            # The old refresh tokens were revoked; this session gets one of the new version
+            result["refresh_token"] = jwt_service.create_refresh_token(user_id, token_version)
+        return result
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except password_service.PasswordPoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update user: {str(e)}")
 
 """
-Get all users who have completed onboarding, excluding the current user.
-Returns a list of users with their profile information for discovery.
+Get a page of recommended users for the current user.
+Returns user profiles for discovery; the cursor for the next page is in the X-Next-Cursor header.
 """
 @app.get("/people", response_model=List[PeopleResponse], status_code=200)
-def get_people(current_user: dict = Depends(get_current_user)):
+async def get_people(
+    request: Request,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(user_service.PEOPLE_PAGE_SIZE, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get all onboarded users except the current user.
-    Returns user profiles for the people discovery feature.
+    Get recommended users (or, for users without recommendations, other onboarded users)
+    excluding the current user and anyone they already liked.
     """
     try:
         user_id = current_user.get("user_id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        # Checked before the recommendations are loaded; a 304 costs one Redis call
+        etag = await resource_etag(cache.people_versions, user_id, cursor, limit)
+        if responses.is_fresh(request, etag):
+            return responses.not_modified(etag)
+
         # Get recommendations for the current user
-        people = user_service.get_user_recommendations(user_id)
-        
+        people, next_cursor = await user_service.get_user_recommendations_cached(user_id, cursor, limit)
+        headers = responses.validator_headers(etag)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+
         for person in people:
-            for field in ["bio", "image_url", "linkedin_url", "github_url", "twitter_url"]:
+            for field in PEOPLE_OPTIONAL_FIELDS:
                 if person.get(field) is None:
                     person[field] = ""
-        return people
+            # Cards don't need the full-size photo
+            person["image_url"] = image_service.variant_url(person["image_url"], "card")
+        # Rows come from our own RPCs with PeopleResponse's columns, so they are
+        # serialized as they are instead of being validated again
+        return ORJSONResponse(people, headers=headers)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch people: {str(e)}")
 
-@app.post("/like", status_code=201)
-def like_user(
+@app.post("/like", status_code=201, dependencies=[Depends(rate_limit(
+    Limit("like", like_user_limiter, "user"),
+    Limit("like", like_ip_limiter, "ip")
+))])
+async def like_user(
     likee_id: str = Body(..., embed=True),
     current_user: dict = Depends(get_current_user)
 ):
@@ -412,84 +659,195 @@ def like_user(
     Like another user. The current user (liker) likes the user with likee_id.
     """
     try:
-        # Get current user's email and fetch their user record to get the UUID
-        user_id = current_user.get("user_id")
-        if not user_id:
+        # The token's subject is the liker's id; no need to fetch their profile
+        liker_id = current_user.get("user_id")
+        if not liker_id:
             raise HTTPException(status_code=401, detail="Invalid token")
-        liker = user_service.get_user_by_id(user_id)
-        if not liker or not liker.get("id"):
-            raise HTTPException(status_code=404, detail="Liker user not found")
-        liker_id = liker["id"]
 
-        supabase.table("Likes").insert({
-            "liker_id": liker_id,
-            "likee_id": likee_id,
-            "liked_at": datetime.utcnow().isoformat()
-        }).execute()
-
-        # Boolean to notify client of match
-        # Note that adding to match table is handled via trigger
-        is_match = like_service.is_match(liker_id, likee_id)
+        # Inserts the like (idempotently) and reports the match in one call;
+        # the Matches row itself is still added by the insert_match trigger
+        result = await like_service.like_user(liker_id, likee_id)
+        # Liked users are excluded from /people
+        await cache.recommendations_cache.invalidate(liker_id)
+        if result["is_match"] and result["created"]:
+            await cache.match_versions.bump(liker_id, likee_id)
 
         response = {
             "message": "User liked successfully",
-            "is_match": is_match,
+            "is_match": result["is_match"],
         }
 
-        if is_match:
-            matched_with = user_service.get_user_by_id(likee_id)
-            response["matched_with"] = matched_with['first_name']
+        if result["is_match"]:
+            response["matched_with"] = result["first_name"]
+            response["match"] = {
+                "match_id": result["match_id"],
+                "first_name": result["first_name"],
+                "last_name": result["last_name"],
+                "image_url": result["image_url"],
+            }
 
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to like user: {str(e)}")
+
+"""
+Apply a queue of likes collected by the client (e.g. swiped offline) in one call.
+Returns the likes that produced a match.
+"""
+@app.post("/likes/bulk", status_code=201, dependencies=[Depends(rate_limit(
+    Limit("likes-bulk", like_bulk_limiter, "user"),
+    Limit("likes-bulk", like_ip_limiter, "ip")
+))])
+async def like_users(request: BulkLikeRequest, current_user: dict = Depends(get_current_user)):
+    liker_id = current_user.get("user_id")
+    if not liker_id:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if len(request.likes) > like_service.MAX_BULK_LIKES:
+        raise HTTPException(status_code=400, detail=f"At most {like_service.MAX_BULK_LIKES} likes per request")
+    if not request.likes:
+        return {"liked": 0, "matches": []}
+
+    try:
+        results = await like_service.like_users(liker_id, [like.dict(exclude_none=True) for like in request.likes])
+        await cache.recommendations_cache.invalidate(liker_id)
+        matched = [r["likee_id"] for r in results if r["is_match"] and r["created"]]
+        if matched:
+            await cache.match_versions.bump(liker_id, *matched)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to like users: {str(e)}")
+
+    return {
+        "liked": sum(1 for r in results if r["created"]),
+        "matches": [
+            {
+                "likee_id": r["likee_id"],
+                "match_id": r["match_id"],
+                "first_name": r["first_name"],
+                "last_name": r["last_name"],
+                "image_url": r["image_url"],
+            }
+            for r in results if r["is_match"]
+        ],
+    }
     
 @app.get("/matches", status_code=200)
-def get_matches(current_user: dict = Depends(get_current_user)):
+async def get_matches(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user.get("user_id")
     if not user_id:
         raise HTTPException(401, "Invalid token")
-    return match_service.get_matches(user_id)
+    etag = await resource_etag(cache.match_versions, user_id)
+    if responses.is_fresh(request, etag):
+        return responses.not_modified(etag)
+
+    matches = await match_service.get_matches(user_id)
+    # The chat list only shows avatars
+    for match in matches:
+        other = match.get("other_user") or {}
+        other["image_url"] = image_service.variant_url(other.get("image_url"), "avatar")
+    return ORJSONResponse(matches, headers=responses.validator_headers(etag))
 
 @app.get("/messages", status_code=200)
-async def get_messages(matchId: str = Query(...)):
+async def get_messages(
+    request: Request,
+    response: Response,
+    matchId: str = Query(...),
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    since: Optional[int] = Query(None),
+    fromSeq: Optional[int] = Query(None, ge=1),
+    toSeq: Optional[int] = Query(None, ge=1),
+    limit: int = Query(message_service.MESSAGES_PAGE_SIZE, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get a page of chat history, oldest first. Only the match's two users can read it.
+    Pass the X-Before-Cursor header of a page as `before` to load older messages,
+    X-After-Cursor as `after` to load newer ones, or `since` (epoch millis) after a reconnect.
+    `fromSeq`/`toSeq` return exactly the sequence range a client missed.
+    """
     if not matchId:
         return []
+    # Checked before the ETag so no version stamp is created for other rooms
+    if not await match_service.is_match_member(matchId, current_user.get("user_id")):
+        raise HTTPException(status_code=404, detail="Match not found")
 
-    response = supabase.table("Messages") \
-        .select("*") \
-        .eq("match_id", matchId) \
-        .order("sent_at", desc=False) \
-        .execute()
+    etag = await resource_etag(cache.message_versions, matchId, before, after, since, fromSeq, toSeq, limit)
+    if responses.is_fresh(request, etag):
+        return responses.not_modified(etag)
 
-    if hasattr(response, "error") and response.error:
-        raise HTTPException(500, str(response.error))
+    try:
+        if fromSeq is not None:
+            rows = await message_service.get_messages_by_seq(matchId, fromSeq, toSeq, limit)
+        else:
+            rows = await message_service.get_messages_page(matchId, before, after, since, limit)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+    response.headers.update(responses.validator_headers(etag))
+    if rows:
+        response.headers["X-Before-Cursor"] = message_service.encode_cursor(rows[0])
+        response.headers["X-After-Cursor"] = message_service.encode_cursor(rows[-1])
     
     transformed = [
         {
+            "id": row["message_id"],
             "message": row["content"],
             "from": row["sender_id"],
-            "timestamp": int(isoparse(row["sent_at"]).timestamp() * 1000),
+            "timestamp": row["sent_at_ms"],
+            "seq": row.get("seq"),
         }
-        for row in response.data
+        for row in rows
     ]
     return transformed
 
 @app.get("/user")
-def get_user_image(current_user: dict = Depends(get_current_user)):
+async def get_user_image(
+    variant: str = Query("avatar"),
+    current_user: dict = Depends(get_current_user)
+):
     user_id = current_user.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    # Uploaded images are addressed by the content hash the token carries
+    digest = current_user.get("image_digest")
+    if digest:
+        return {"image_url": image_service.digest_url(digest, variant)}
+
     try:
-        user = user_service.get_user_by_id(user_id)
+        user = await user_service.get_user_profile_cached(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return {"image_url": user.get("image_url", "")}
+        return {"image_url": image_service.variant_url(user.get("image_url", ""), variant)}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve image: {str(e)}")
 
 
+# Peers allowed to read /metrics and /cache/stats (e.g. the Prometheus scraper)
+INTERNAL_NETWORKS = parse_networks(os.getenv("INTERNAL_NETWORKS", "127.0.0.1,::1"))
+
+def internal_only(request: Request):
+    """
+    Dependency for operational endpoints: only direct requests from INTERNAL_NETWORKS.
+    Anything relayed by a proxy (which adds X-Forwarded-For) came from outside.
+    """
+    peer = request.client.host if request.client else ""
+    if not in_networks(peer, INTERNAL_NETWORKS) or "x-forwarded-for" in request.headers:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(internal_only)])
+def get_metrics():
+    body, content_type = instrumentation.metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/cache/stats", dependencies=[Depends(internal_only)])
+def get_cache_stats():
+    """
+    Hit/miss counters for this worker's read-through caches.
+    """
+    return cache.stats()
+
+
 app = socketio.ASGIApp(sio, other_asgi_app=app)
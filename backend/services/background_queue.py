@@ -0,0 +1,54 @@
+import asyncio
+import traceback
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+class BackgroundQueue:
+    """
+    Single-consumer job queue on the event loop that coalesces jobs by key.
+    Enqueuing a key that is still waiting replaces its job, so only the latest
+    request per key runs.
+    """
+    def __init__(self, name: str = "background-queue"):
+        self.name = name
+        self._jobs = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs) -> None:
+        """
+        Queue fn(*args, **kwargs). Must be called from the event loop.
+        """
+        self._jobs[key] = (fn, args, kwargs)
+        self._idle.clear()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    async def join(self, timeout: float = None) -> bool:
+        """
+        Wait until every queued job has run. Returns False on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            while self._jobs:
+                _, (fn, args, kwargs) = self._jobs.popitem(last=False)
+                try:
+                    await fn(*args, **kwargs)
+                except Exception:
+                    print(f"Exception in {self.name} job:")
+                    traceback.print_exc()
+            self._wakeup.clear()
+            self._idle.set()
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def fingerprint(text: str, version: Optional[str] = None) -> str:
+    """
+    Fingerprint of embed text plus model version, stored next to each embedding.
+    Defaults to the version of whichever process does the encoding (see model_version).
+    """
+    return content_hash(f"{version or model_version()}\n{text}")
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache of embeddings keyed by content hash.
+    """
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: List[float]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+class EmbeddingBatcher:
+    """
+    Micro-batching front end for a sentence embedding model.
+    Texts submitted within max_wait_ms of each other are encoded together in a
+    single encode_batch call on a dedicated thread; callers get a Future (or can
+    await aencode). Results are cached by content hash so identical text is never
+    re-encoded.
+    """
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], Sequence],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 4096,
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache = LRUCache(cache_size)
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue text for embedding. Returns a Future resolving to a list of floats.
+        """
+        key = content_hash(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        with self._lock:
+            # Share the in-flight encode if the same text is already queued
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, text))
+                self._ensure_worker()
+        return future
+
+    def encode(self, text: str) -> List[float]:
+        """Blocking helper for synchronous callers."""
+        return self.submit(text).result()
+
+    async def aencode(self, text: str) -> List[float]:
+        """Awaitable helper that does not block the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            keys = [key for key, _ in batch]
+            try:
+                vectors = self.encode_batch([text for _, text in batch])
+                results = [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+            except Exception as e:
+                with self._lock:
+                    futures = [self._pending.pop(key) for key in keys]
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for key, result in zip(keys, results):
+                self.cache.put(key, result)
+            with self._lock:
+                futures = [self._pending.pop(key) for key in keys]
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+# Model configuration. The model is only imported and loaded on first use so
+# that importing the API (and answering /signin) never pays for torch.
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "torch" (default), "onnx", or "onnx-int8" for the quantized ONNX export
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Bump when stored embeddings must be regenerated (see jobs/reembed_stale.py)
+MODEL_VERSION = os.getenv("EMBEDDING_MODEL_VERSION", f"{MODEL_NAME}:{EMBEDDING_BACKEND}:1")
+# When set, encoding is delegated to a shared embedding_worker process
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL")
+
+_model = None
+# MODEL_VERSION of the embedding worker, learned from /health and refreshed by every /embed
+_remote_model_version = None
+_model_lock = threading.Lock()
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_model():
+    """
+    Load the sentence-transformers model on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                if EMBEDDING_BACKEND == "onnx":
+                    _model = SentenceTransformer(MODEL_NAME, backend="onnx")
+                elif EMBEDDING_BACKEND == "onnx-int8":
+                    _model = SentenceTransformer(
+                        MODEL_NAME,
+                        backend="onnx",
+                        model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE}
+                    )
+                else:
+                    _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+def is_model_loaded() -> bool:
+    return _model is not None
+
+def encode_local(texts: List[str]):
+    return get_model().encode(texts)
+
+def encode_remote(texts: List[str]) -> List[List[float]]:
+    global _remote_model_version
+    import httpx
+    response = httpx.post(f"{EMBEDDING_SERVICE_URL.rstrip('/')}/embed", json={"texts": texts}, timeout=30.0)
+    response.raise_for_status()
+    body = response.json()
+    _remote_model_version = body["model_version"]
+    return body["embeddings"]
+
+def model_version() -> str:
+    """
+    Version of the model that actually encodes. When encoding is delegated this is
+    the worker's MODEL_VERSION (its model and backend), not this process's.
+    Blocks on the first call in a delegating process; async callers use amodel_version.
+    """
+    global _remote_model_version
+    if not EMBEDDING_SERVICE_URL:
+        return MODEL_VERSION
+    if _remote_model_version is None:
+        import httpx
+        response = httpx.get(f"{EMBEDDING_SERVICE_URL.rstrip('/')}/health", timeout=10.0)
+        response.raise_for_status()
+        _remote_model_version = response.json()["model_version"]
+    return _remote_model_version
+
+async def amodel_version() -> str:
+    if not EMBEDDING_SERVICE_URL or _remote_model_version is not None:
+        return model_version()
+    return await asyncio.to_thread(model_version)
+
+def get_embedder() -> EmbeddingBatcher:
+    """
+    Return the process-wide batcher, backed by the shared worker if configured.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                encode_batch = encode_remote if EMBEDDING_SERVICE_URL else encode_local
+                _embedder = EmbeddingBatcher(encode_batch, max_batch_size=32, max_wait_ms=5)
+    return _embedder
+
+# Opt back into loading at import time (used by the embedding worker and the startup benchmark)
+if os.getenv("EMBEDDING_EAGER_LOAD") == "1" and not EMBEDDING_SERVICE_URL:
+    get_model()
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+from instrumentation import timed
+from supabase_client import SUPABASE_URL, get_async_supabase
+
+BUCKET = "profile-images"
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+READ_CHUNK_BYTES = 64 * 1024
+# Refuse to decode images larger than this many pixels (decompression bombs)
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Longest side, in pixels, of each WebP variant. Variants are stored next to each
+# other under profiles/<sha256 of the upload>/<variant>.webp
+VARIANTS = {"full": 1600, "card": 640, "avatar": 128}
+DEFAULT_VARIANT = "full"
+# Where get_public_url serves the bucket's objects from
+PUBLIC_URL = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET}"
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+# Content-addressed objects never change, so browsers and the CDN may keep them for a year
+CACHE_CONTROL = "31536000"
+
+# Decoding and resizing run in their own process pool, like bcrypt, so a large
+# upload cannot hold the GIL that serves every other request
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+class ImageTooLarge(Exception):
+    """Raised while reading an upload as soon as it passes MAX_IMAGE_BYTES."""
+
+class InvalidImage(Exception):
+    """Raised when an upload cannot be decoded as an image."""
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> Tuple[bytes, str]:
+    """
+    Read an upload in chunks, stopping as soon as it exceeds max_bytes.
+    Returns the content and its sha256 hex digest.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise ImageTooLarge()
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+def _render_variants(content: bytes) -> Dict[str, bytes]:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(io.BytesIO(content)) as source:
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except Exception as e:
+        # Plain ValueError so it pickles back from the worker process
+        raise ValueError(f"Could not decode image: {e}")
+
+    variants = {}
+    # Largest first, each one resized from the previous, so only the first resize touches the full image
+    for name, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        variants[name] = out.getvalue()
+    return variants
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+async def render_variants(content: bytes) -> Dict[str, bytes]:
+    """WebP bytes for each of VARIANTS, rendered in the image pool."""
+    try:
+        with timed("image"):
+            return await asyncio.wrap_future(get_pool().submit(_render_variants, content))
+    except ValueError as e:
+        raise InvalidImage(str(e))
+
+def variant_path(digest: str, variant: str = DEFAULT_VARIANT) -> str:
+    return f"profiles/{digest}/{variant}.webp"
+
+def variant_url(image_url: Optional[str], variant: str) -> Optional[str]:
+    """
+    The URL of another variant of an uploaded image. URLs that are not variants
+    (images uploaded before variants existed, external URLs) are returned unchanged.
+    """
+    if not image_url or variant not in VARIANTS:
+        return image_url
+    base, _, filename = image_url.rpartition("/")
+    name, _, ext = filename.partition(".")
+    if name not in VARIANTS or ext != "webp":
+        return image_url
+    return f"{base}/{variant}.webp"
+
+def image_digest(image_url: Optional[str]) -> Optional[str]:
+    """
+    The content hash of an image stored by store_image, read from one of its
+    variant URLs. None for any other URL.
+    """
+    prefix = f"{PUBLIC_URL}/profiles/"
+    if not image_url or not image_url.startswith(prefix):
+        return None
+    digest, _, filename = image_url[len(prefix):].partition("/")
+    name, _, ext = filename.partition(".")
+    if len(digest) != 64 or name not in VARIANTS or ext != "webp":
+        return None
+    return digest
+
+def digest_url(digest: str, variant: str = DEFAULT_VARIANT) -> str:
+    """The public URL of a variant of the image stored under digest."""
+    if variant not in VARIANTS:
+        variant = DEFAULT_VARIANT
+    return f"{PUBLIC_URL}/{variant_path(digest, variant)}"
+
+async def store_image(content: bytes, digest: str) -> Dict[str, str]:
+    """
+    Store the variants of an image under its content hash and return their
+    public URLs. An image that was uploaded before is not rendered or uploaded again.
+    """
+    supabase = await get_async_supabase()
+    bucket = supabase.storage.from_(BUCKET)
+
+    existing = await bucket.list(f"profiles/{digest}")
+    stored = {item.get("name") for item in existing or []}
+    missing = [name for name in VARIANTS if f"{name}.webp" not in stored]
+    if missing:
+        variants = await render_variants(content)
+        await asyncio.gather(*(
+            bucket.upload(variant_path(digest, name), variants[name], {
+                "content-type": "image/webp",
+                "cache-control": CACHE_CONTROL,
+                "upsert": "true",
+            })
+            for name in missing
+        ))
+
+    return {name: await bucket.get_public_url(variant_path(digest, name)) for name in VARIANTS}
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
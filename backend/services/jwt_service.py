@@ -1,18 +1,59 @@
 import os
+import uuid
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from jose import jwt
 from dotenv import load_dotenv
+from services import image_service
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Refresh tokens let clients get a new access token without signing in (and running bcrypt) again
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
-def create_jwt_token(user_id: str) -> str:
+def compact_claims(user: dict) -> dict:
+    """
+    Small profile claims carried in access tokens so handlers can skip a profile fetch.
+    They reflect the profile when the token was issued; /users/update returns a
+    token with fresh ones.
+    - onb: has_onboarded, which the client reads to route after sign-in
+    - iv: the content hash of an uploaded profile image, from which /user builds
+      its URLs. Left out for external images and users without one.
+    """
+    claims = {"onb": bool(user.get("has_onboarded"))}
+    digest = image_service.image_digest(user.get("image_url"))
+    if digest:
+        claims["iv"] = digest
+    return claims
+
+def create_jwt_token(user_id: str, claims: Optional[dict] = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode = {
+        **(claims or {}),
+        "sub": user_id,
+        "exp": expire
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_refresh_token(user_id: str, version: int = 0) -> str:
+    """
+    `version` is the user's token_version; bumping it (on password change)
+    revokes every refresh token issued with an older one.
+    """
+    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode = {
         "sub": user_id,
+        "typ": "refresh",
+        "ver": int(version or 0),
+        # Lets each refresh token be used only once (see /token/refresh)
+        "jti": uuid.uuid4().hex,
         "exp": expire
     }
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_token(token: str) -> dict:
+    """Verify a token's signature and expiry. Raises jose.JWTError if invalid."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
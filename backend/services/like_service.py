@@ -1,24 +1,27 @@
-from supabase_client import supabase
+from typing import List, Optional
+from supabase_client import get_async_supabase
 
-def is_match(liker_id: str, likee_id: str) -> bool:
+# Most likes accepted in one /likes/bulk call
+MAX_BULK_LIKES = 100
+
+async def like_user(liker_id: str, likee_id: str, liked_at: Optional[str] = None) -> dict:
+    """
+    Like a user in one round trip. Liking the same user again is a no-op.
+    Returns {likee_id, created, is_match, match_id, first_name, last_name, image_url};
+    the match fields are only set when the two users have matched.
+    """
+    params = {"liker": liker_id, "likee": likee_id}
+    if liked_at:
+        params["liked_at"] = liked_at
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("like_user", params).execute()
+    return response.data[0]
+
+async def like_users(liker_id: str, likes: List[dict]) -> list:
     """
-    Check if both users have liked each other (mutual match).
-    Returns True if a match exists, otherwise False.
+    Apply a queue of likes ({likee_id, liked_at?}) in one round trip.
+    Returns one like_user result per distinct likee.
     """
-    # Check if user1 liked user2
-    like1 = supabase.table("Likes") \
-        .select("like_id") \
-        .eq("liker_id", liker_id) \
-        .eq("likee_id", likee_id) \
-        .limit(1) \
-        .execute()
-    
-    # Check if user2 liked user1
-    like2 = supabase.table("Likes") \
-        .select("like_id") \
-        .eq("liker_id", likee_id) \
-        .eq("likee_id", liker_id) \
-        .limit(1) \
-        .execute()
-    
-    return bool(like1.data) and bool(like2.data)
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("like_users", {"liker": liker_id, "likes": likes}).execute()
+    return response.data if response.data else []
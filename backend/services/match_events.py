@@ -0,0 +1,72 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from services import image_service, match_service
+import cache
+
+USER_ROOM_PREFIX = "user:"
+
+def user_room(user_id: str) -> str:
+    """The socket.io room every socket of an authenticated user joins."""
+    return f"{USER_ROOM_PREFIX}{user_id}"
+
+class MatchEventTailer:
+    """
+    Tails the match_events outbox and pushes `matchCreated` to both users' rooms,
+    shaped like a /matches entry ({match_id, matched_at, other_user}). Claiming
+    deletes the events, so every API node can tail at once without duplicates.
+    An event claimed by a node that dies before emitting is lost; the users
+    still see the match on their next /matches load.
+    """
+    def __init__(
+        self,
+        emit: Callable[..., Awaitable],
+        poll_interval_ms: int = 1000,
+        batch_size: int = 100,
+    ):
+        self.emit = emit
+        self.poll_interval = poll_interval_ms / 1000.0
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="match-events")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def poll(self) -> int:
+        """Claim and deliver one batch. Returns the number of events delivered."""
+        events = await match_service.claim_match_events(self.batch_size)
+        for event in events:
+            await self._deliver(event)
+        return len(events)
+
+    async def _deliver(self, event: dict) -> None:
+        user1, user2 = event["user1"], event["user2"]
+        # /matches ETags change for both users
+        await cache.match_versions.bump(user1["id"], user2["id"])
+        for user, other in ((user1, user2), (user2, user1)):
+            other = dict(other, image_url=image_service.variant_url(other.get("image_url"), "avatar"))
+            await self.emit("matchCreated", {
+                "match_id": event["match_id"],
+                "matched_at": event["matched_at"],
+                "other_user": other,
+            }, room=user_room(user["id"]))
+
+    async def _run(self) -> None:
+        backoff = self.poll_interval
+        while True:
+            try:
+                delivered = await self.poll()
+                backoff = self.poll_interval
+                # A full batch means more are probably waiting
+                if delivered < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Exception while tailing match events:", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
@@ -1,8 +1,52 @@
-from supabase_client import supabase
+import uuid
+from typing import List, Optional
+from supabase_client import get_async_supabase
+import cache
 
-def get_matches(user_id: str):
+def is_match_id(value) -> bool:
+    """
+    Whether value is a well-formed match id (a uuid).
+    """
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+async def get_matches(user_id: str):
     """
     Get all users matched with the given user_id.
     """
-    response = supabase.rpc("matched_users_object", {"target_user_id": user_id}).execute()    
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("matched_users_object", {"target_user_id": user_id}).execute()    
+    return response.data if response.data else []
+
+async def get_match_members(match_id: str) -> Optional[List[str]]:
+    """
+    Get the ids of a match's two users, or None if there is no such match.
+    Cached, since a match's users never change.
+    """
+    async def load():
+        supabase = await get_async_supabase()
+        response = await supabase.table("Matches").select("user1_id, user2_id").eq("match_id", match_id).limit(1).execute()
+        if not response.data:
+            return None
+        return [response.data[0]["user1_id"], response.data[0]["user2_id"]]
+
+    return await cache.match_members_cache.get_or_load(match_id, load)
+
+async def is_match_member(match_id: str, user_id: str) -> bool:
+    """
+    Whether user_id is one of the two users of match_id. Malformed ids are never members.
+    """
+    if not user_id or not is_match_id(match_id):
+        return False
+    return user_id in (await get_match_members(str(uuid.UUID(match_id))) or [])
+
+async def claim_match_events(batch_size: int = 100):
+    """
+    Take up to batch_size new-match events off the outbox, with both users' display fields.
+    """
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("claim_match_events", {"batch_size": batch_size}).execute()
     return response.data if response.data else []
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import List, Optional, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from postgrest.exceptions import APIError
+from services import message_service
+import cache
+
+class MessagePipeline:
+    """
+    Write-behind persistence for chat messages.
+    Messages are appended to a Redis stream on the hot path; a flusher task reads
+    them through a consumer group and inserts them in bulk, acknowledging only
+    after the insert succeeds (at-least-once). Inserts are idempotent on
+    message_id, so redelivered entries never create duplicate rows.
+    When the database rejects a batch, its rows are retried one at a time so a
+    bad row cannot hold up the rest; a row rejected max_rejections times is
+    moved to the `{stream}:dead` stream and acknowledged.
+    """
+    def __init__(
+        self,
+        redis: Redis,
+        stream: str = "chat:messages",
+        group: str = "persist",
+        batch_size: int = 200,
+        flush_interval_ms: int = 250,
+        claim_idle_ms: int = 60000,
+        max_stream_len: int = 1_000_000,
+        max_rejections: int = 5,
+    ):
+        self.redis = redis
+        self.stream = stream
+        self.group = group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.claim_idle_ms = claim_idle_ms
+        self.max_stream_len = max_stream_len
+        self.max_rejections = max_rejections
+        self.dead_letter_stream = f"{stream}:dead"
+        # Hash of entry id -> times the database rejected that entry on its own
+        self.rejections_key = f"{stream}:rejections"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def append(self, message: dict) -> str:
+        """
+        Queue a message row (match_id, sender_id, content, sent_at, message_id) for persistence.
+        """
+        return await self.redis.xadd(
+            self.stream, {"data": json.dumps(message)},
+            maxlen=self.max_stream_len, approximate=True
+        )
+
+    async def start(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="message-flusher")
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """
+        Stop reading new work after flushing everything this consumer can see.
+        Called on shutdown so a deploy never drops queued messages.
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            print("Message flusher did not drain in time; unacked messages stay pending in", self.stream)
+        self._task = None
+
+    async def _read(self, entry_id: str, block_ms: Optional[int]) -> List[Tuple[str, dict]]:
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: entry_id},
+            count=self.batch_size, block=block_ms
+        )
+        return response[0][1] if response else []
+
+    async def _collect(self) -> List[Tuple[str, dict]]:
+        """
+        Read up to batch_size new entries, waiting at most flush_interval after the first one.
+        """
+        batch = await self._read(">", int(self.flush_interval * 1000))
+        deadline = time.monotonic() + self.flush_interval
+        while batch and len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = await self._read(">", max(1, int(remaining * 1000)))
+            if not more:
+                break
+            batch.extend(more)
+        return batch
+
+    async def _persist(self, entries: List[Tuple[str, dict]]) -> int:
+        """
+        Insert and acknowledge entries. Returns how many were left pending.
+        """
+        if not entries:
+            return 0
+        rows = [json.loads(fields["data"]) for _, fields in entries]
+        try:
+            await message_service.insert_messages(rows)
+        except APIError as e:
+            # Rejected by the database rather than unreachable: isolate the bad rows.
+            # Anything else (network errors) propagates and the whole batch is retried.
+            print("Chat message batch rejected, inserting rows one at a time:", e)
+            return await self._persist_rows(entries, rows)
+        await self._ack([entry_id for entry_id, _ in entries], rows)
+        return 0
+
+    async def _persist_rows(self, entries: List[Tuple[str, dict]], rows: List[dict]) -> int:
+        done, persisted, dead = [], [], []
+        for (entry_id, fields), row in zip(entries, rows):
+            try:
+                await message_service.insert_messages([row])
+            except APIError as e:
+                rejections = await self.redis.hincrby(self.rejections_key, entry_id, 1)
+                if rejections < self.max_rejections:
+                    # Stays pending and is retried with the next batch
+                    continue
+                print(f"Dead-lettering chat message {entry_id} after {rejections} rejections:", e)
+                dead.append((entry_id, {**fields, "error": str(e)}))
+                done.append(entry_id)
+                continue
+            done.append(entry_id)
+            persisted.append(row)
+
+        if dead:
+            pipe = self.redis.pipeline(transaction=False)
+            for entry_id, fields in dead:
+                pipe.xadd(self.dead_letter_stream, fields)
+            await pipe.execute()
+        await self._ack(done, persisted)
+        return len(entries) - len(done)
+
+    async def _ack(self, ids: List[str], rows: List[dict]) -> None:
+        if not ids:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xack(self.stream, self.group, *ids)
+        pipe.xdel(self.stream, *ids)
+        pipe.hdel(self.rejections_key, *ids)
+        if rows:
+            # The rooms' /messages ETags change only now that the rows are readable
+            pipe.delete(*{cache.message_versions.key(row["match_id"]) for row in rows})
+        await pipe.execute()
+
+    async def _claim_abandoned(self) -> None:
+        # Take over entries left pending by consumers that died mid-batch
+        await self.redis.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size
+        )
+
+    async def _run(self) -> None:
+        backoff = self.flush_interval
+        last_claim = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_claim > self.claim_idle_ms / 1000.0:
+                    await self._claim_abandoned()
+                    last_claim = time.monotonic()
+
+                # Retry anything already delivered to this consumer but not yet acked
+                pending = await self._read("0", None)
+                if pending:
+                    if await self._persist(pending):
+                        # Rows the database keeps rejecting; back off before retrying them
+                        await asyncio.sleep(backoff)
+                        backoff = min(backoff * 2, 10.0)
+                    continue
+
+                if self._stopping.is_set():
+                    batch = await self._read(">", None)
+                    if not batch:
+                        return
+                else:
+                    batch = await self._collect()
+                await self._persist(batch)
+                backoff = self.flush_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Exception while persisting chat messages:", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
@@ -0,0 +1,77 @@
+import uuid
+from typing import Optional, Tuple
+from supabase_client import get_async_supabase
+
+# Default number of messages per /messages page
+MESSAGES_PAGE_SIZE = 50
+
+async def insert_messages(rows: list):
+    """
+    Bulk insert message rows. Rows whose message_id already exists are skipped,
+    so retrying a batch is safe.
+    """
+    supabase = await get_async_supabase()
+    return await supabase.table("Messages") \
+        .upsert(rows, on_conflict="message_id", ignore_duplicates=True) \
+        .execute()
+
+def encode_cursor(row: dict) -> str:
+    return f"{row['sent_at_us']}_{row['message_id']}"
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Split a "<epoch microseconds>_<message_id>" cursor. Raises ValueError if malformed.
+    """
+    sent_at_us, message_id = cursor.split("_", 1)
+    return int(sent_at_us), str(uuid.UUID(message_id))
+
+async def get_messages_page(
+    match_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since: Optional[int] = None,
+    limit: int = MESSAGES_PAGE_SIZE
+) -> list:
+    """
+    Get one page of a match's messages, oldest first, in a single RPC.
+    `before`/`after` are cursors from a previous page; `since` (epoch millis)
+    returns messages sent at or after that time, for catching up after a reconnect.
+    Without any of them the latest page is returned.
+    """
+    params = {"target_match_id": match_id, "page_limit": limit}
+    if before:
+        params["before_us"], params["before_id"] = decode_cursor(before)
+    if after:
+        params["after_us"], params["after_id"] = decode_cursor(after)
+    elif since is not None:
+        params["after_us"] = since * 1000
+
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("get_messages_page", params).execute()
+    return response.data if response.data else []
+
+async def get_max_seq(match_id: str) -> int:
+    """
+    Get the highest sequence number stored for a match, or 0 if it has none.
+    """
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("get_max_message_seq", {"target_match_id": match_id}).execute()
+    return int(response.data or 0)
+
+async def get_messages_by_seq(
+    match_id: str,
+    from_seq: int,
+    to_seq: Optional[int] = None,
+    limit: int = MESSAGES_PAGE_SIZE
+) -> list:
+    """
+    Get a match's messages with from_seq <= seq <= to_seq, oldest first.
+    Used by clients to fetch exactly the range they missed.
+    """
+    params = {"target_match_id": match_id, "from_seq": from_seq, "page_limit": limit}
+    if to_seq is not None:
+        params["to_seq"] = to_seq
+
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("get_messages_by_seq", params).execute()
+    return response.data if response.data else []
@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from instrumentation import timed
+
+# Hashes made with other cost parameters are flagged by verify_and_update and
+# replaced on the user's next successful sign-in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt runs in its own process pool so a login burst cannot starve the
+# threadpool (or the GIL) that serves every other request
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Jobs allowed to wait or run before callers are turned away with PasswordPoolBusy
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 4)))
+
+class PasswordPoolBusy(Exception):
+    """Raised instead of queueing when the password pool is saturated."""
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the API process already runs threads (httpx, embedding batcher)
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_MAX_PENDING:
+        raise PasswordPoolBusy()
+    _pending += 1
+    try:
+        with timed("bcrypt"):
+            return await asyncio.wrap_future(get_pool().submit(fn, *args))
+    finally:
+        _pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password against its stored hash. Returns (valid, new_hash), where
+    new_hash is set when the stored hash uses outdated parameters and should be replaced.
+    """
+    return await _submit(_verify_and_update, password, hashed)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    valid, _ = await verify_and_update(password, hashed)
+    return valid
+
+def pending() -> int:
+    return _pending
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
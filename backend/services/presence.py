@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Optional
+from redis.asyncio import Redis
+
+class RoomPresence:
+    """
+    Cluster-wide count of sockets in each chat room.
+    Each node records its own sockets in a per-room sorted set scored by the
+    last heartbeat time, and re-scores them every heartbeat_seconds. Counts only
+    include entries seen within ttl_seconds, so sockets of a node that died
+    without cleaning up age out on their own.
+    """
+    def __init__(self, redis: Redis, heartbeat_seconds: float = 30.0, ttl_seconds: float = 90.0, prefix: str = "chat:presence"):
+        self.redis = redis
+        self.heartbeat_seconds = heartbeat_seconds
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._local = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    def key(self, room: str) -> str:
+        return f"{self.prefix}:{{{room}}}"
+
+    async def join(self, room: str, sid: str) -> int:
+        self._local[room].add(sid)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(self.key(room), {sid: time.time()})
+        pipe.expire(self.key(room), int(self.ttl_seconds))
+        await pipe.execute()
+        return await self.count(room)
+
+    async def leave(self, room: str, sid: str) -> int:
+        sids = self._local.get(room)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._local[room]
+        await self.redis.zrem(self.key(room), sid)
+        return await self.count(room)
+
+    def has(self, room: str, sid: str) -> bool:
+        """Whether sid joined room on this node."""
+        return sid in self._local.get(room, ())
+
+    async def count(self, room: str) -> int:
+        return await self.redis.zcount(self.key(room), time.time() - self.ttl_seconds, "+inf")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._heartbeat(), name="room-presence")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Remove this node's sockets right away instead of waiting for them to age out
+        if self._local:
+            pipe = self.redis.pipeline(transaction=False)
+            for room, sids in self._local.items():
+                pipe.zrem(self.key(room), *sids)
+            await pipe.execute()
+            self._local.clear()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            now = time.time()
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for room, sids in list(self._local.items()):
+                    pipe.zadd(self.key(room), {sid: now for sid in sids})
+                    pipe.zremrangebyscore(self.key(room), "-inf", now - self.ttl_seconds)
+                    pipe.expire(self.key(room), int(self.ttl_seconds))
+                await pipe.execute()
+            except Exception as e:
+                print("Exception during presence heartbeat:", e)
@@ -0,0 +1,139 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from redis.asyncio import Redis
+
+# Store a per-user ack only if it moves forward
+ACK_MAX_LUA = """
+local cur = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local seq = tonumber(ARGV[2])
+if seq > cur then
+  redis.call('HSET', KEYS[1], ARGV[1], seq)
+  cur = seq
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return cur
+"""
+
+# INCR the room's sequence only if it exists; 0 means it must be seeded first
+INCR_IF_EXISTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+return redis.call('INCR', KEYS[1])
+"""
+
+# Seed a missing sequence (a concurrent seed wins) and take the next number
+SEED_AND_INCR_LUA = """
+redis.call('SET', KEYS[1], ARGV[1], 'NX')
+return redis.call('INCR', KEYS[1])
+"""
+
+class RoomSequencer:
+    """
+    Per-room message sequence numbers and per-user delivery acks, kept in Redis
+    so every node agrees. Clients use the sequence to detect gaps and fetch only
+    the missing range from /messages.
+    If a room's counter is missing from Redis (evicted, or lost in a failover),
+    it is re-seeded from load_max_seq (the highest seq stored for the room)
+    rather than restarting at 1.
+    """
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str = "chat",
+        ack_ttl_seconds: int = 30 * 24 * 3600,
+        load_max_seq: Optional[Callable[[str], Awaitable[int]]] = None,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ack_ttl_seconds = ack_ttl_seconds
+        self.load_max_seq = load_max_seq
+
+    def seq_key(self, room: str) -> str:
+        return f"{self.prefix}:seq:{{{room}}}"
+
+    def ack_key(self, room: str) -> str:
+        return f"{self.prefix}:ack:{{{room}}}"
+
+    async def next(self, room: str) -> int:
+        key = self.seq_key(room)
+        if self.load_max_seq is None:
+            return int(await self.redis.incr(key))
+        seq = int(await self.redis.eval(INCR_IF_EXISTS_LUA, 1, key))
+        if seq:
+            return seq
+        return int(await self.redis.eval(SEED_AND_INCR_LUA, 1, key, int(await self.load_max_seq(room))))
+
+    async def current(self, room: str) -> int:
+        value = await self.redis.get(self.seq_key(room))
+        if value is None and self.load_max_seq is not None:
+            return int(await self.load_max_seq(room))
+        return int(value or 0)
+
+    async def ack(self, room: str, user_id: str, seq: int) -> int:
+        """
+        Record that user_id has received everything up to seq. Returns the stored ack.
+        """
+        return int(await self.redis.eval(ACK_MAX_LUA, 1, self.ack_key(room), user_id, int(seq), self.ack_ttl_seconds))
+
+    async def last_acked(self, room: str, user_id: str) -> int:
+        return int(await self.redis.hget(self.ack_key(room), user_id) or 0)
+
+class RoomFlushScheduler:
+    """
+    Coalesces messages sent to the same room within window_ms into one
+    `receiveMessages` frame ({roomId, fromSeq, toSeq, messages}). With
+    window_ms <= 0 every message is emitted on its own as `receiveMessage`.
+    """
+    def __init__(
+        self,
+        emit: Callable[..., Awaitable],
+        window_ms: float = 0,
+        max_batch: int = 100,
+    ):
+        self.emit = emit
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._buffers = {}
+        self._timers = {}
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def publish(self, room: str, message: dict) -> None:
+        if not self.enabled:
+            await self.emit("receiveMessage", message, room=room)
+            return
+
+        buffer = self._buffers.setdefault(room, [])
+        buffer.append(message)
+        if len(buffer) >= self.max_batch:
+            await self.flush(room)
+        elif room not in self._timers:
+            self._timers[room] = asyncio.get_running_loop().call_later(self.window, self._flush_later, room)
+
+    def _flush_later(self, room: str) -> None:
+        task = asyncio.ensure_future(self.flush(room))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, room: str) -> None:
+        timer = self._timers.pop(room, None)
+        if timer is not None:
+            timer.cancel()
+        messages = self._buffers.pop(room, None)
+        if not messages:
+            return
+        messages.sort(key=lambda m: m.get("seq", 0))
+        await self.emit("receiveMessages", {
+            "roomId": room,
+            "fromSeq": messages[0].get("seq"),
+            "toSeq": messages[-1].get("seq"),
+            "messages": messages,
+        }, room=room)
+
+    async def flush_all(self) -> None:
+        for room in list(self._buffers):
+            await self.flush(room)
@@ -0,0 +1,173 @@
+import json
+import threading
+import numpy as np
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# all-MiniLM-L6-v2 produces 384-dim embeddings
+EMBEDDING_DIM = 384
+
+def parse_embedding(embedding) -> np.ndarray:
+    """
+    Convert an embedding as returned by Supabase into a 1-D float32 array.
+    pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings.
+    """
+    if isinstance(embedding, str):
+        embedding = json.loads(embedding)
+    vector = np.asarray(embedding, dtype=np.float32)
+    # Flatten if nested
+    if vector.ndim > 1:
+        vector = vector.reshape(-1)
+    return vector
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalise each row in place so cosine similarity becomes a dot product.
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+class SimilarityIndex:
+    """
+    In-memory cosine similarity index over user embeddings.
+    Rows are stored pre-normalised in one contiguous float32 matrix, so scoring
+    a batch of queries against every user is a single matmul.
+    """
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((max(1, capacity), dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._positions = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._positions
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Contiguous (len(self), dim) view of the normalised embeddings."""
+        return self._matrix[:len(self._ids)]
+
+    def position(self, user_id: str) -> Optional[int]:
+        return self._positions.get(user_id)
+
+    def vector(self, user_id: str) -> Optional[np.ndarray]:
+        pos = self._positions.get(user_id)
+        return None if pos is None else self._matrix[pos]
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:len(self._ids)] = self.matrix
+        self._matrix = grown
+
+    def add(self, user_id: str, embedding) -> None:
+        """
+        Insert or replace a single user's embedding.
+        """
+        self.add_many([user_id], [embedding])
+
+    def add_many(self, user_ids: Sequence[str], embeddings) -> None:
+        """
+        Insert or replace embeddings for many users at once.
+        """
+        if len(user_ids) == 0:
+            return
+        if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2:
+            vectors = np.array(embeddings, dtype=np.float32)
+        else:
+            vectors = np.stack([parse_embedding(e) for e in embeddings])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim embeddings, got {vectors.shape[1]}")
+        normalize(vectors)
+
+        with self._lock:
+            new_ids = [u for u in dict.fromkeys(user_ids) if u not in self._positions]
+            self._grow(len(self._ids) + len(new_ids))
+            for user_id in new_ids:
+                self._positions[user_id] = len(self._ids)
+                self._ids.append(user_id)
+            rows = [self._positions[u] for u in user_ids]
+            self._matrix[rows] = vectors
+
+    def remove(self, user_id: str) -> None:
+        """
+        Drop a user from the index by moving the last row into its slot.
+        """
+        with self._lock:
+            pos = self._positions.pop(user_id, None)
+            if pos is None:
+                return
+            last = len(self._ids) - 1
+            if pos != last:
+                moved = self._ids[last]
+                self._matrix[pos] = self._matrix[last]
+                self._ids[pos] = moved
+                self._positions[moved] = pos
+            self._ids.pop()
+
+    def _topk_rows(self, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            empty = np.zeros((scores.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        # argpartition finds the k best in O(n) per row; only those k get sorted
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def topk(self, queries, k: int = 10, exclude_ids: Optional[Sequence[Iterable[str]]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Find the k most similar users for each query embedding.
+        `queries` is one embedding or a (m, dim) batch; `exclude_ids` optionally
+        gives, per query, user ids that must not be returned.
+        Returns one list of (user_id, cosine similarity) per query, best first.
+        """
+        if isinstance(queries, (list, tuple)) and queries and isinstance(queries[0], (str, list, tuple, np.ndarray)):
+            q = np.stack([parse_embedding(e) for e in queries])
+        elif isinstance(queries, str):
+            q = parse_embedding(queries)[None, :]
+        else:
+            q = np.array(queries, dtype=np.float32, ndmin=2)
+        normalize(q)
+
+        with self._lock:
+            if not self._ids:
+                return [[] for _ in range(q.shape[0])]
+            scores = q @ self.matrix.T
+            if exclude_ids is not None:
+                for i, excluded in enumerate(exclude_ids):
+                    cols = [self._positions[u] for u in excluded if u in self._positions]
+                    scores[i, cols] = -np.inf
+            cols, best = self._topk_rows(scores, k)
+            ids = self._ids
+            return [
+                [(ids[c], float(s)) for c, s in zip(row_cols, row_scores) if s != -np.inf]
+                for row_cols, row_scores in zip(cols, best)
+            ]
+
+    def neighbours(self, positions: np.ndarray, k: int = 10) -> np.ndarray:
+        """
+        Top-k neighbour positions for users already in the index, excluding themselves.
+        Returns an array of shape (len(positions), min(k, len(self) - 1)), best first.
+        """
+        with self._lock:
+            positions = np.asarray(positions, dtype=np.int64)
+            scores = self.matrix[positions] @ self.matrix.T
+            # A user is never their own neighbour
+            scores[np.arange(len(positions)), positions] = -np.inf
+            cols, _ = self._topk_rows(scores, min(k, len(self._ids) - 1))
+            return cols
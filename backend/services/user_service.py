@@ -1,93 +1,201 @@
-from supabase_client import supabase
+from supabase_client import get_async_supabase
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional, Tuple
+from services.similarity_index import SimilarityIndex
+from services import embedding_service
+from services.background_queue import BackgroundQueue
+import cache
+import instrumentation
+import asyncio
+import time
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# In-process similarity index over user_vectors, rebuilt from the database every
+# SIMILARITY_INDEX_TTL_SECONDS so rows inserted by other workers show up. Stale
+# indexes keep serving while a background task builds the replacement.
+SIMILARITY_INDEX_TTL_SECONDS = 300
+SIMILARITY_INDEX_PAGE_SIZE = 1000
+_similarity_index = None
+_similarity_index_loaded_at = 0.0
+_similarity_index_lock = asyncio.Lock()
+_similarity_index_refresh: Optional[asyncio.Task] = None
+# Embeddings added while a rebuild runs, replayed onto the new index before the swap
+_similarity_index_pending: List[Tuple[str, List[float]]] = []
 
-def get_user_by_email(email: str):
-    response = supabase.table("User").select("*").eq("email", email).limit(1).execute()
+# Users nearest to a new or changed embedding whose stored recommendations are
+# checked for it (see update_reverse_neighbours)
+REVERSE_NEIGHBOUR_CANDIDATES = 200
+
+# Default page size for the people discovery feed
+PEOPLE_PAGE_SIZE = 20
+
+# Profile fields that feed build_embedding_text
+EMBEDDING_FIELDS = {"bio", "user_domain", "user_sector", "skills", "desired_skills", "desired_domain"}
+
+# Embedding and recommendation refreshes triggered by profile updates
+refresh_queue = BackgroundQueue(name="embedding-refresh")
+
+# Column sets for User lookups; callers ask only for what they use.
+# PROFILE_COLUMNS is every profile column /users/me and /users/update return;
+# the password hash and token version are never part of it.
+PROFILE_COLUMNS = (
+    "id, email, first_name, last_name, bio, image_url, "
+    "user_domain, desired_domain, user_sector, skills, desired_skills, "
+    "linkedin_url, github_url, twitter_url, other_url, "
+    "has_onboarded, created_at, last_login"
+)
+# What sign-in needs: the hash, plus the fields jwt_service.compact_claims reads
+# token_version is the refresh-token generation (see jwt_service.create_refresh_token)
+SIGNIN_COLUMNS = "id, password, token_version, has_onboarded, image_url"
+PROFILE_WITH_PASSWORD_COLUMNS = f"{PROFILE_COLUMNS}, password, token_version"
+
+async def get_user_by_email(email: str, columns: str = PROFILE_COLUMNS):
+    supabase = await get_async_supabase()
+    response = await supabase.table("User").select(columns).eq("email", email).limit(1).execute()
     return response.data[0] if response.data else None
 
-def get_user_by_id(id: str):
-    response = supabase.table("User").select("*").eq("id", id).limit(1).execute()
+async def get_user_by_id(id: str, columns: str = PROFILE_COLUMNS):
+    supabase = await get_async_supabase()
+    response = await supabase.table("User").select(columns).eq("id", id).limit(1).execute()
     return response.data[0] if response.data else None
 
-def insert_user(email: str, password: str):
-    return supabase.table("User").insert({
+async def get_user_profile_cached(id: str) -> Optional[dict]:
+    """
+    Get a user's profile (PROFILE_COLUMNS) through the Redis read-through cache.
+    """
+    async def load():
+        return await get_user_by_id(id)
+    return await cache.profile_cache.get_or_load(id, load)
+
+async def get_user_recommendations_cached(user_id: str, cursor: Optional[str] = None, limit: int = PEOPLE_PAGE_SIZE) -> Tuple[list, Optional[str]]:
+    """
+    get_user_recommendations through the Redis read-through cache.
+    """
+    async def load():
+        return await get_user_recommendations(user_id, cursor, limit)
+    people, next_cursor = await cache.recommendations_cache.get_or_load(
+        user_id, load, field=f"{cursor or ''}:{limit}"
+    )
+    return people, next_cursor
+
+async def insert_user(email: str, password: str):
+    supabase = await get_async_supabase()
+    return await supabase.table("User").insert({
         "email": email, 
         "password": password, 
         "has_onboarded": False, 
         "last_login": datetime.now().isoformat()
     }).execute()
 
-def update_user_by_id(id: str, update_data: dict) -> dict:
+async def update_user_by_id(id: str, update_data: dict) -> dict:
     """
     Update user information by ID.
     Only updates the fields provided in update_data.
     """
-    response = supabase.table("User").update(update_data).eq("id", id).execute()
+    supabase = await get_async_supabase()
+    response = await supabase.table("User").update(update_data).eq("id", id).execute()
     
     if response.data:
+        await cache.profile_cache.invalidate(id)
         return response.data[0]
     raise ValueError("Failed to update user")
 
-def get_onboarded_users_except_current(user_id: str):
+async def get_onboarded_users_except_current(user_id: str, after_id: Optional[str] = None, limit: int = PEOPLE_PAGE_SIZE):
     """
-    Get all users who have completed onboarding, excluding the current user.
-    Returns only the specified fields for the people discovery feature.
+    Get one page of users who have completed onboarding, excluding the current user
+    and anyone they already liked. Pages are keyed by the last id returned.
     """
-    response = supabase.table("User").select(
-        "id, first_name, last_name, bio, image_url, user_domain, user_sector, skills, linkedin_url, github_url, twitter_url"
-    ).eq("has_onboarded", True).neq("id", user_id).execute()
-    
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("get_onboarded_profiles", {
+        "target_user_id": user_id,
+        "after_id": after_id,
+        "page_size": limit
+    }).execute()
+    return response.data if response.data else []
+
+async def get_recommended_profiles(user_id: str, after_rank: int = 0, limit: int = PEOPLE_PAGE_SIZE):
+    """
+    Get one page of hydrated recommended profiles, in rank order, in a single call.
+    Each row carries its rank for use as the next cursor.
+    """
+    supabase = await get_async_supabase()
+    response = await supabase.rpc("get_recommended_profiles", {
+        "target_user_id": user_id,
+        "after_rank": after_rank,
+        "page_size": limit
+    }).execute()
     return response.data if response.data else []
 
-def get_user_recommendations(user_id: str):
+async def has_recommendations(user_id: str) -> bool:
+    supabase = await get_async_supabase()
+    response = await supabase.table("recommendations").select("user_id").eq("user_id", user_id).limit(1).execute()
+    return bool(response.data)
+
+async def get_user_recommendations(user_id: str, cursor: Optional[str] = None, limit: int = PEOPLE_PAGE_SIZE) -> Tuple[list, Optional[str]]:
     """
-    Get the recommendations for a user.
+    Get a page of recommended users for a user.
+    Cursors are opaque: "r<rank>" pages through the ranked recommendations and
+    "u<id>" pages through the fallback list of all onboarded users.
+    Returns the page and the cursor for the next one (None when exhausted).
     """
+    if cursor is not None and not (cursor.startswith("u") or (cursor.startswith("r") and cursor[1:].isdigit())):
+        raise ValueError("Invalid cursor")
 
-    recommended_user_ids = supabase.table("recommendations").select("*").eq("user_id", user_id).execute()
+    if cursor is None or cursor.startswith("r"):
+        after_rank = int(cursor[1:]) if cursor else 0
+        people = await get_recommended_profiles(user_id, after_rank, limit)
 
-    # If user's recommendations don't exist
-    if not recommended_user_ids.data:
-        user = get_user_by_id(user_id)
-        embed_user_and_add_to_recommendations(user)
-        recommended_user_ids = supabase.table("recommendations").select("*").eq("user_id", user_id).execute()
+        # If user's recommendations don't exist yet, compute them once
+        if not people and cursor is None and not await has_recommendations(user_id):
+            user = await get_user_by_id(user_id)
+            if user:
+                await embed_user_and_add_to_recommendations(user, force=True)
+                people = await get_recommended_profiles(user_id, after_rank, limit)
+
+        if people:
+            next_cursor = f"r{people[-1]['rank']}" if len(people) == limit else None
+            for person in people:
+                person.pop("rank", None)
+            return people, next_cursor
+        if cursor is not None:
+            return [], None
 
-    recommended_users = supabase.table("User").select("*").in_("id", recommended_user_ids.data[0]["recommended_user_ids"]).execute()
-    if recommended_users.data:
-        return recommended_users.data
     # Fallback for the users without embeddings and recommendations yet (old users)
-    return get_onboarded_users_except_current(user_id)
+    after_id = cursor[1:] if cursor and cursor.startswith("u") else None
+    people = await get_onboarded_users_except_current(user_id, after_id, limit)
+    next_cursor = f"u{people[-1]['id']}" if len(people) == limit else None
+    return people, next_cursor
 
-def embed_user_and_add_to_recommendations(user: dict):
+async def embed_user_and_add_to_recommendations(user: dict, force: bool = False):
     """
     Embed a user and add their embedding to the user_vectors table and add the results to the recommendations table.
+    Recommendations are only recomputed when the embedding changed, unless force is set.
     """
-    embedding = add_user_embedding(user)
-    add_to_recommendations(embedding, user["id"])
+    embedding, changed = await sync_user_embedding(user)
+    if changed or force:
+        await add_to_recommendations(embedding, user["id"])
+    if changed:
+        # Let existing users see the new or changed profile without waiting for the Lambda
+        await update_reverse_neighbours(user["id"])
 
-def add_user_embedding(user: dict) -> List[float]:
+def schedule_embedding_refresh(user: dict):
     """
-    Generate and upsert an embedding for the user.
-    Returns the embedding.
+    Queue embed_user_and_add_to_recommendations to run off the request path.
+    Repeated updates for the same user collapse into one job with the latest profile.
     """
-    # Check if the embedding already exists
-    response = supabase.table("user_vectors").select("*").eq("user_id", user["id"]).limit(1).execute()
-    if response.data:
-        return response.data[0]["embedding"]
+    refresh_queue.enqueue(user["id"], embed_user_and_add_to_recommendations, user)
 
-    # Generate string to embed
-    bio = user.get('bio', '')
-    user_domain = ', '.join(user.get('user_domain', []))
-    user_sector = ', '.join(user.get('user_sector', []))
-    desired_skills = ', '.join(user.get('desired_skills', []))
-    desired_domain = ', '.join(user.get('desired_domain', []))
-    skills = ', '.join(user.get('skills', []))
+def build_embedding_text(user: dict) -> str:
+    """
+    Build the text that represents a user's profile for embedding.
+    """
+    bio = user.get('bio') or ''
+    user_domain = ', '.join(user.get('user_domain') or [])
+    user_sector = ', '.join(user.get('user_sector') or [])
+    desired_skills = ', '.join(user.get('desired_skills') or [])
+    desired_domain = ', '.join(user.get('desired_domain') or [])
+    skills = ', '.join(user.get('skills') or [])
 
-    str_to_embed = (
+    return (
         f"Bio: {bio}."
         f"Domain: {user_domain}."
         f"Sector: {user_sector}."
@@ -96,34 +204,205 @@ def add_user_embedding(user: dict) -> List[float]:
         f"Desired Domain: {desired_domain}."
     )
 
+async def add_user_embedding(user: dict) -> List[float]:
+    """
+    Generate and upsert an embedding for the user.
+    Returns the embedding.
+    """
+    embedding, _ = await sync_user_embedding(user)
+    return embedding
+
+async def sync_user_embedding(user: dict) -> Tuple[List[float], bool]:
+    """
+    Make sure the stored embedding matches the user's current profile and model.
+    Re-embeds only when the content fingerprint differs from the stored one.
+    Returns the embedding and whether it was (re)computed.
+    """
+    supabase = await get_async_supabase()
+    str_to_embed = build_embedding_text(user)
+    # The encoding process's version, which is the worker's when one is configured
+    version = await embedding_service.amodel_version()
+    fingerprint = embedding_service.fingerprint(str_to_embed, version)
+
+    # Check if an up-to-date embedding already exists
+    response = await supabase.table("user_vectors").select("embedding, fingerprint").eq("user_id", user["id"]).limit(1).execute()
+    if response.data and response.data[0].get("fingerprint") == fingerprint:
+        return response.data[0]["embedding"], False
+
     # Generate embedding
-    embedding = get_text_embedding(str_to_embed)
-    supabase.table("user_vectors").insert({"user_id": user["id"], "embedding": embedding}).execute()
+    embedding = await get_text_embedding(str_to_embed)
+    # A worker restarted with another model mid-request reports its new version on /embed
+    encoded_version = await embedding_service.amodel_version()
+    if encoded_version != version:
+        version, fingerprint = encoded_version, embedding_service.fingerprint(str_to_embed, encoded_version)
+    await supabase.table("user_vectors").upsert({
+        "user_id": user["id"],
+        "embedding": embedding,
+        "fingerprint": fingerprint,
+        "model_version": version
+    }, on_conflict="user_id").execute()
+    await add_to_similarity_index(user["id"], embedding)
 
-    return embedding
+    return embedding, True
 
-def add_to_recommendations(embedding: List[float], user_id: str):
+async def add_to_recommendations(embedding: List[float], user_id: str):
     """
     Use a user's embedding to perform a similarity search on the user_vectors table
     and upsert the results into the recommendations table.
     """
-    similar_users = get_similar_users_rpc(embedding, user_id)
+    supabase = await get_async_supabase()
+    similar_users = await get_similar_users(embedding, user_id)
 
     # Upsert into recommendations table
-    supabase.table("recommendations").upsert({
+    await supabase.table("recommendations").upsert({
         "user_id": user_id,
         "recommended_user_ids": similar_users
     }).execute()
+    await cache.recommendations_cache.invalidate(user_id)
+
+async def update_reverse_neighbours(user_id: str, top_n: int = 10) -> List[str]:
+    """
+    Patch the stored recommendations of other users after user_id's embedding
+    was added or changed, without recomputing everyone.
+    Rows of the REVERSE_NEIGHBOUR_CANDIDATES nearest users get the user spliced
+    in when it now beats their k-th stored neighbour; rows that already list the
+    user are recomputed, since it may have moved or dropped out.
+    Returns the ids of the rows rewritten.
+    """
+    index = await get_similarity_index()
+    position = index.position(user_id)
+    if position is None or len(index) < 2:
+        return []
+    matrix = index.matrix
+    vector = matrix[position]
+    candidates = [uid for uid, _ in index.topk(vector, REVERSE_NEIGHBOUR_CANDIDATES, exclude_ids=[[user_id]])[0]]
+
+    supabase = await get_async_supabase()
+    near, listing = await asyncio.gather(
+        supabase.table("recommendations").select("user_id, recommended_user_ids").in_("user_id", candidates).execute(),
+        supabase.table("recommendations").select("user_id, recommended_user_ids").contains("recommended_user_ids", [user_id]).execute()
+    )
+    stored = {row["user_id"]: row.get("recommended_user_ids") or [] for row in (near.data or []) + (listing.data or [])}
+
+    updates = []
+    for owner, recs in stored.items():
+        row = index.position(owner)
+        if row is None or owner == user_id:
+            continue
+        known = [r for r in recs if r in index and r != owner]
+        if user_id in recs or len(known) < min(top_n, len(index) - 1):
+            new_recs = [index.ids[c] for c in index.neighbours([row], top_n)[0]]
+        else:
+            # The owner's threshold is the similarity of its weakest stored neighbour
+            scores = matrix[[index.position(r) for r in known]] @ matrix[row]
+            score = float(vector @ matrix[row])
+            if score <= float(scores.min()):
+                continue
+            ranked = sorted(zip(known, scores.tolist()), key=lambda pair: -pair[1])
+            ranked.insert(next((i for i, (_, s) in enumerate(ranked) if score > s), len(ranked)), (user_id, score))
+            new_recs = [uid for uid, _ in ranked[:top_n]]
+        if new_recs != recs:
+            updates.append({"user_id": owner, "recommended_user_ids": new_recs})
 
-def get_text_embedding(text: str) -> List[float]:
+    if updates:
+        await supabase.table("recommendations").upsert(updates).execute()
+        await cache.recommendations_cache.invalidate(*(u["user_id"] for u in updates))
+    return [u["user_id"] for u in updates]
+
+async def get_text_embedding(text: str) -> List[float]:
     """
     Generate an embedding for the given text using a sentence-transformers model.
+    The model is loaded lazily (or served by the embedding worker). Requests are
+    micro-batched and cached by content hash (see embedding_service).
     Returns the embedding as a list of floats.
     """
-    embedding = model.encode(text)
-    return embedding.tolist()
+    with instrumentation.timed("embedding"):
+        return await embedding_service.get_embedder().aencode(text)
+
+async def load_similarity_index() -> SimilarityIndex:
+    """
+    Build a similarity index from every row of the user_vectors table, page by page.
+    """
+    supabase = await get_async_supabase()
+    user_ids, embeddings = [], []
+    start = 0
+    while True:
+        response = await supabase.table("user_vectors") \
+            .select("user_id, embedding") \
+            .order("user_id") \
+            .range(start, start + SIMILARITY_INDEX_PAGE_SIZE - 1) \
+            .execute()
+        rows = response.data or []
+        for row in rows:
+            if row.get("embedding"):
+                user_ids.append(row["user_id"])
+                embeddings.append(row["embedding"])
+        if len(rows) < SIMILARITY_INDEX_PAGE_SIZE:
+            break
+        start += SIMILARITY_INDEX_PAGE_SIZE
+
+    # Parsing and stacking every embedding is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(_build_similarity_index, user_ids, embeddings)
+
+def _build_similarity_index(user_ids: List[str], embeddings: list) -> SimilarityIndex:
+    index = SimilarityIndex(capacity=len(user_ids))
+    index.add_many(user_ids, embeddings)
+    return index
+
+async def _refresh_similarity_index() -> None:
+    global _similarity_index, _similarity_index_loaded_at, _similarity_index_refresh
+    try:
+        index = await load_similarity_index()
+        for user_id, embedding in _similarity_index_pending:
+            index.add(user_id, embedding)
+        _similarity_index = index
+        _similarity_index_loaded_at = time.monotonic()
+    except Exception as e:
+        # Keep serving the old index; the next request past the TTL retries
+        print("Exception while rebuilding the similarity index:", e)
+    finally:
+        _similarity_index_pending.clear()
+        _similarity_index_refresh = None
+
+async def get_similarity_index() -> SimilarityIndex:
+    """
+    Return the process-wide similarity index. Only the first call waits for a
+    load; once the index is stale it is rebuilt in the background and the old
+    one is served until the new one is swapped in.
+    """
+    global _similarity_index, _similarity_index_loaded_at, _similarity_index_refresh
+    if _similarity_index is None:
+        async with _similarity_index_lock:
+            if _similarity_index is None:
+                _similarity_index = await load_similarity_index()
+                _similarity_index_loaded_at = time.monotonic()
+    elif _similarity_index_refresh is None and time.monotonic() - _similarity_index_loaded_at > SIMILARITY_INDEX_TTL_SECONDS:
+        _similarity_index_refresh = asyncio.create_task(_refresh_similarity_index(), name="similarity-index-refresh")
+    return _similarity_index
+
+async def add_to_similarity_index(user_id: str, embedding: List[float]) -> None:
+    """
+    Add or replace a user's embedding in the index, including one being rebuilt.
+    """
+    (await get_similarity_index()).add(user_id, embedding)
+    if _similarity_index_refresh is not None:
+        _similarity_index_pending.append((user_id, embedding))
+
+async def get_similar_users(embedding: list, user_id: str, top_n: int = 10) -> List[str]:
+    """
+    Return the ids of the top_n users most similar to the embedding, excluding user_id.
+    Uses the in-process index and falls back to the pgvector RPC if it is unavailable.
+    """
+    try:
+        index = await get_similarity_index()
+        if len(index):
+            return [uid for uid, _ in index.topk(embedding, top_n, exclude_ids=[[user_id]])[0]]
+    except Exception as e:
+        print("Exception during local similarity search:", e)
+    return await get_similar_users_rpc(embedding, user_id, top_n)
 
-def get_similar_users_rpc(embeddings: list, user_id: str, top_n: int = 10):
+async def get_similar_users_rpc(embeddings: list, user_id: str, top_n: int = 10):
+    supabase = await get_async_supabase()
     # Flatten if nested
 
     if isinstance(embeddings[0], list):
@@ -131,7 +410,7 @@ def get_similar_users_rpc(embeddings: list, user_id: str, top_n: int = 10):
     embedding_str = "[" + ",".join([str(x) for x in embeddings]) + "]"
 
     try:
-        response = supabase.rpc(
+        response = await supabase.rpc(
             "get_similar_users",
             {
                 "input_embedding": embedding_str,
@@ -1,10 +1,50 @@
 import os
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client
+from supabase import create_client, acreate_client, AsyncClient, AsyncClientOptions
+from instrumentation import InstrumentedTransport
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# Blocking client for scripts and jobs that run outside the API's event loop
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Async client used by the API; all requests share one pooled HTTP/2 connection set
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+_async_supabase: AsyncClient | None = None
+_async_supabase_lock = asyncio.Lock()
+
+async def get_async_supabase() -> AsyncClient:
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_supabase_lock:
+            if _async_supabase is None:
+                transport = httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=SUPABASE_MAX_CONNECTIONS,
+                        max_keepalive_connections=SUPABASE_MAX_CONNECTIONS
+                    )
+                )
+                http_client = httpx.AsyncClient(
+                    # Each round trip is counted and timed per request
+                    transport=InstrumentedTransport(transport, "supabase"),
+                    timeout=SUPABASE_TIMEOUT_SECONDS
+                )
+                _async_supabase = await acreate_client(
+                    SUPABASE_URL, SUPABASE_KEY,
+                    options=AsyncClientOptions(httpx_client=http_client)
+                )
+    return _async_supabase
+
+async def close_async_supabase():
+    global _async_supabase
+    if _async_supabase is not None:
+        await _async_supabase.options.httpx_client.aclose()
+        _async_supabase = None
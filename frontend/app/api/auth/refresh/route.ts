@@ -0,0 +1,33 @@
+import { NextResponse } from 'next/server'
+import { forwardedFor } from '@/lib/forwarded'
+
+export async function POST(request: Request) {
+  try {
+    const body = await request.json()
+    
+    const response = await fetch('http://localhost:8000/token/refresh', {
+      method: 'POST',
+      headers: {
+        ...forwardedFor(request),
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(body),
+    })
+
+    const data = await response.json()
+
+    if (!response.ok) {
+      return NextResponse.json(
+        { error: data.detail || 'Token refresh failed' },
+        { status: response.status }
+      )
+    }
+
+    return NextResponse.json(data)
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Internal Server Error' },
+      { status: 500 }
+    )
+  }
+}
\ No newline at end of file
@@ -1,4 +1,5 @@
 import { NextResponse } from 'next/server'
+import { forwardedFor } from '@/lib/forwarded'
 
 export async function POST(request: Request) {
   try {
@@ -7,6 +8,7 @@ export async function POST(request: Request) {
     const response = await fetch('http://localhost:8000/signin', {
       method: 'POST',
       headers: {
+        ...forwardedFor(request),
         'Content-Type': 'application/json',
       },
       body: JSON.stringify(body),
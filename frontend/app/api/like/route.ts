@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { forwardedFor } from "@/lib/forwarded";
 
 export async function POST(request: NextRequest) {
   try {
@@ -14,6 +15,7 @@ export async function POST(request: NextRequest) {
     const response = await fetch("http://localhost:8000/like", {
       method: "POST",
       headers: {
+        ...forwardedFor(request),
         "Content-Type": "application/json",
         Authorization: authHeader,
       },
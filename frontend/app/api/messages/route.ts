@@ -1,5 +1,6 @@
 // app/api/messages/route.ts
 import { NextRequest, NextResponse } from "next/server"
+import { forwardedFor } from "@/lib/forwarded"
 
 export async function GET(request: NextRequest) {
   const { searchParams } = new URL(request.url)
@@ -8,13 +9,14 @@ export async function GET(request: NextRequest) {
     return NextResponse.json({ error: "Missing matchId" }, { status: 400 })
   }
 
-  // Forward to backend
+  // Forward to backend, including any pagination params (before, after, since, limit)
   const token = request.headers.get("authorization")
   const response = await fetch(
-    `http://localhost:8000/messages?matchId=${matchId}`,
+    `http://localhost:8000/messages?${searchParams.toString()}`,
     {
       method: "GET",
       headers: {
+        ...forwardedFor(request),
         "Content-Type": "application/json",
         ...(token ? { Authorization: token } : {}),
       },
@@ -27,5 +29,10 @@ export async function GET(request: NextRequest) {
   }
 
   const data = await response.json()
-  return NextResponse.json(data)
+  const headers = new Headers()
+  for (const name of ["X-Before-Cursor", "X-After-Cursor"]) {
+    const value = response.headers.get(name)
+    if (value) headers.set(name, value)
+  }
+  return NextResponse.json(data, { headers })
 }
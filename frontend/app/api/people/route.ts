@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { forwardedFor } from "@/lib/forwarded";
 
 export async function GET(request: NextRequest) {
   try {
@@ -16,11 +17,26 @@ export async function GET(request: NextRequest) {
     const response = await fetch("http://localhost:8000/people", {
       method: "GET",
       headers: {
+        ...forwardedFor(request),
         "Content-Type": "application/json",
         Authorization: authHeader,
+        // Let the backend answer 304 when the browser's copy is current
+        ...(request.headers.get("if-none-match")
+          ? { "If-None-Match": request.headers.get("if-none-match")! }
+          : {}),
       }
     });
 
+    const validators: Record<string, string> = {};
+    for (const name of ["etag", "cache-control"]) {
+      const value = response.headers.get(name);
+      if (value) validators[name] = value;
+    }
+
+    if (response.status === 304) {
+      return new NextResponse(null, { status: 304, headers: validators });
+    }
+
     if (!response.ok) {
       const errorText = await response.text();
       console.error("Backend error:", errorText);
@@ -31,7 +47,7 @@ export async function GET(request: NextRequest) {
     }
 
     const result = await response.json();
-    return NextResponse.json(result);
+    return NextResponse.json(result, { headers: validators });
   } catch (error) {
     console.error("API route error:", error);
     return NextResponse.json(
@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { forwardedFor } from "@/lib/forwarded";
 
 export async function POST(request: NextRequest) {
   try {
@@ -18,6 +19,7 @@ export async function POST(request: NextRequest) {
     const response = await fetch("http://localhost:8000/upload-image", {
       method: "POST",
       headers: {
+        ...forwardedFor(request),
         Authorization: authHeader,
       },
       body: formData,
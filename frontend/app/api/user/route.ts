@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { forwardedFor } from "@/lib/forwarded";
 
 export async function GET(request: NextRequest) {
   try {
@@ -15,6 +16,7 @@ export async function GET(request: NextRequest) {
     const response = await fetch("http://localhost:8000/user", {
       method: "GET",
       headers: {
+        ...forwardedFor(request),
         "Content-Type": "application/json",
         Authorization: authHeader,
       }
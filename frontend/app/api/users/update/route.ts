@@ -1,4 +1,5 @@
 import { NextRequest, NextResponse } from "next/server";
+import { forwardedFor } from "@/lib/forwarded";
 
 export async function PATCH(request: NextRequest) {
   try {
@@ -18,6 +19,7 @@ export async function PATCH(request: NextRequest) {
     const response = await fetch("http://localhost:8000/users/update", {
       method: "PATCH",
       headers: {
+        ...forwardedFor(request),
         "Content-Type": "application/json",
         Authorization: authHeader,
       },
@@ -6,6 +6,7 @@ import ProfileCard from '@/components/ui/ProfileCard';
 import { Profile } from './mockData';
 import { ToastContainer, toast } from 'react-toastify';
 import { useRouter } from "next/navigation";
+import { apiFetch } from "@/lib/api";
 
 export default function HomePage() {
   const [profiles, setProfiles] = useState<Profile[]>([]);
@@ -23,7 +24,7 @@ export default function HomePage() {
       }
 
       try {
-        const response = await fetch('/api/people', {
+        const response = await apiFetch('/api/people', {
           method: 'GET',
           headers: {
             'Content-Type': 'application/json',
@@ -58,7 +59,7 @@ export default function HomePage() {
       return;
     }
     try {
-      const response = await fetch('/api/like', {
+      const response = await apiFetch('/api/like', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
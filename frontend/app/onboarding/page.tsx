@@ -9,6 +9,7 @@ import { SocialLinks } from "@/components/onboarding/SocialLinks";
 import { Button } from "@/components/ui/button";
 import { Card } from "@/components/ui/card";
 import { useEffect } from "react";
+import { apiFetch, storeTokens } from "@/lib/api";
 
 interface FormData {
   firstName: string;
@@ -93,7 +94,7 @@ export default function OnboardingPage() {
         throw new Error("No authentication token found");
       }
 
-      const response = await fetch("/api/users/update", {
+      const response = await apiFetch("/api/users/update", {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
@@ -111,6 +112,8 @@ export default function OnboardingPage() {
 
       const result = await response.json();
       console.log("Update successful:", result);
+      // The new access token carries the updated profile claims
+      storeTokens(result);
       return result;
     } catch (error) {
       console.error("Failed to update user data:", error);
@@ -14,6 +14,7 @@ import { Separator } from "@/components/ui/separator";
 import { toast, ToastContainer } from "react-toastify";
 import { validateSocialUrl } from "@/lib/validation";
 import "react-toastify/dist/ReactToastify.css";
+import { apiFetch, storeTokens } from "@/lib/api";
 
 interface UserData {
   id: string;
@@ -124,7 +125,7 @@ export default function ProfilePage() {
         throw new Error("No authentication token found");
       }
 
-      const response = await fetch("/api/users/me", {
+      const response = await apiFetch("/api/users/me", {
         method: "GET",
         headers: {
           "Content-Type": "application/json",
@@ -191,7 +192,7 @@ export default function ProfilePage() {
         throw new Error("No authentication token found");
       }
 
-      const response = await fetch("/api/users/update", {
+      const response = await apiFetch("/api/users/update", {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
@@ -208,6 +209,8 @@ export default function ProfilePage() {
         throw new Error(errorData.error || "Failed to update password");
       }
 
+      // Changing the password revokes every refresh token; keep this session on the new one
+      storeTokens(await response.json());
       toast.success("Password updated successfully!");
     } catch (error) {
       toast.error("Failed to update password. Please verify your current password.");
@@ -222,7 +225,7 @@ export default function ProfilePage() {
         throw new Error("No authentication token found");
       }
 
-      const response = await fetch("/api/users/update", {
+      const response = await apiFetch("/api/users/update", {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
@@ -236,7 +239,10 @@ export default function ProfilePage() {
         throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
       }
 
-      return await response.json();
+      // The new access token carries the updated profile claims
+      const result = await response.json();
+      storeTokens(result);
+      return result;
     } catch (error) {
       console.error("Failed to update user data:", error);
       throw error;
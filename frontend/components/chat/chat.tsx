@@ -11,8 +11,16 @@ import { Gift, Send, X } from "lucide-react";
 import Image from "next/image";
 import { Linkedin, Github, Twitter } from "lucide-react";
 import { useRouter } from "next/navigation";
+import { apiFetch } from "@/lib/api";
 
-type Msg = { message: string; from: string; timestamp: number };
+type Msg = {
+  id?: string;
+  roomId?: string;
+  message: string;
+  from: string;
+  timestamp: number;
+  seq?: number;
+};
 type Match = {
   match_id: string;
   other_user: { first_name: string; last_name: string; image_url?: string };
@@ -22,11 +30,46 @@ type User = {
   image_url?: string;
 };
 
+// Matches the backend's default /messages page size
+const MESSAGES_PAGE_SIZE = 50;
+// Largest page /messages serves, used when filling sequence gaps
+const MESSAGES_MAX_PAGE_SIZE = 200;
+
+// Add incoming messages that aren't already shown, in room sequence order.
+// Messages from before sequence numbers existed have none and stay first.
+function mergeMessages(prev: Msg[], incoming: Msg[]): Msg[] {
+  const seen = new Set(prev.map((m) => m.id).filter(Boolean));
+  const merged = [...prev, ...incoming.filter((m) => !m.id || !seen.has(m.id))];
+  return merged.sort((a, b) => (a.seq ?? 0) - (b.seq ?? 0));
+}
+
+// Messages with fromSeq <= seq <= toSeq, page by page
+async function fetchSeqRange(matchId: string, fromSeq: number, toSeq: number): Promise<Msg[]> {
+  const messages: Msg[] = [];
+  while (fromSeq <= toSeq) {
+    const res = await apiFetch(
+      `/api/messages?matchId=${matchId}&fromSeq=${fromSeq}&toSeq=${toSeq}&limit=${MESSAGES_MAX_PAGE_SIZE}`
+    );
+    if (!res.ok) throw new Error(await res.text());
+    const page: Msg[] = await res.json();
+    messages.push(...page);
+    if (page.length < MESSAGES_MAX_PAGE_SIZE) break;
+    fromSeq = (page[page.length - 1].seq ?? toSeq) + 1;
+  }
+  return messages;
+}
+
 export default function MatchChat() {
   const [currentMessage, setCurrentMessage] = useState("");
   const [matches, setMatches] = useState<Match[]>([]);
   const [selectedMatch, setSelectedMatch] = useState<Match | null>(null);
   const [messages, setMessages] = useState<Msg[]>([]);
+  // Cursor for the page before the oldest loaded message; null once history is complete
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const selectedMatchIdRef = useRef<string | null>(null);
+  // Highest sequence number shown for the selected room, for gap fetches and acks
+  const lastSeqRef = useRef(0);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const [user, setUser] = useState<User | null>(null);
   const socketRef = useRef<Socket>();
@@ -42,14 +85,34 @@ export default function MatchChat() {
   const router = useRouter();
 
   useEffect(() => {
-    const socket = io("http://localhost:8000");
+    // The backend runs websocket-only so requests can land on any node.
+    // The token puts this socket in our user room, which receives matchCreated.
+    const socket = io("http://localhost:8000", {
+      transports: ["websocket"],
+      // Read on every (re)connect, so a refreshed access token is picked up
+      auth: (cb) => cb({ token: localStorage.getItem("access_token") }),
+    });
     socketRef.current = socket;
 
-    socket.on("receiveMessage", (msg: Msg) => {
-      setMessages((prev) => [...prev, msg]);
-      messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
+    // Rooms are per connection: rejoin after a reconnect and fetch what was missed
+    socket.on("connect", () => {
+      if (selectedMatchIdRef.current) joinRoom(selectedMatchIdRef.current);
+    });
+
+    // New matches are pushed instead of polled from /matches
+    socket.on("matchCreated", (match: Match) => {
+      setMatches((prev) =>
+        prev.some((m) => m.match_id === match.match_id) ? prev : [match, ...prev]
+      );
     });
 
+    socket.on("receiveMessage", (msg: Msg) => receiveLive([msg]));
+
+    // Coalesced frame, sent when the server runs with CHAT_COALESCE_MS > 0
+    socket.on("receiveMessages", ({ messages: batch }: { messages: Msg[] }) =>
+      receiveLive(batch)
+    );
+
     // listen for rate limit events from server
     socket.on("rate_limited", ({ retryAfter }: { retryAfter: number }) => {
       const until = Date.now() + Math.ceil(retryAfter * 1000);
@@ -57,8 +120,11 @@ export default function MatchChat() {
     });
 
     return () => {
+      socket.off("connect");
       socket.off("receiveMessage");
+      socket.off("receiveMessages");
       socket.off("rate_limited");
+      socket.off("matchCreated");
       socket.disconnect();
     };
   }, []);
@@ -87,14 +153,14 @@ export default function MatchChat() {
       }
 
       try {
-        const res = await fetch("/api/match", {
+        const res = await apiFetch("/api/match", {
           headers: { Authorization: `Bearer ${token}` },
         });
         const data: Match[] = await res.json();
         setMatches(data);
         if (data.length > 0) selectMatch(data[0]);
 
-        const userRes = await fetch(`/api/user`, {
+        const userRes = await apiFetch(`/api/user`, {
           headers: { Authorization: `Bearer ${token}` },
         });
         if (userRes.ok) {
@@ -109,15 +175,80 @@ export default function MatchChat() {
     })();
   }, []);
 
+  // Tell the server everything up to lastSeqRef has been received in this room
+  function ackSeen(matchId: string) {
+    if (lastSeqRef.current > 0) {
+      socketRef.current?.emit("ackMessages", { roomId: matchId, seq: lastSeqRef.current });
+    }
+  }
+
+  // Show messages up to seq for the selected room, fetching any gap before them
+  async function catchUp(matchId: string, live: Msg[], seq: number) {
+    let missed: Msg[] = [];
+    const from = lastSeqRef.current + 1;
+    if (lastSeqRef.current > 0 && seq >= from) {
+      try {
+        missed = await fetchSeqRange(matchId, from, seq);
+      } catch (e) {
+        console.error("Error fetching missed messages", e);
+      }
+      if (selectedMatchIdRef.current !== matchId) return;
+    }
+    const received = [...missed, ...live];
+    if (received.length === 0) return;
+    // Only advance over contiguous seqs: messages still queued for persistence
+    // are not in /messages yet, and are fetched again with the next live message
+    const seqs = received.map((m) => m.seq ?? 0);
+    if (lastSeqRef.current === 0) {
+      lastSeqRef.current = Math.max(...seqs);
+    } else {
+      const have = new Set(seqs);
+      while (have.has(lastSeqRef.current + 1)) lastSeqRef.current += 1;
+    }
+    setMessages((prev) => mergeMessages(prev, received));
+    messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
+    ackSeen(matchId);
+  }
+
+  function receiveLive(batch: Msg[]) {
+    const matchId = selectedMatchIdRef.current;
+    const live = batch.filter((m) => m.roomId === matchId);
+    if (!matchId || live.length === 0) return;
+    // Anything between the last shown seq and this batch was missed
+    const firstSeq = Math.min(...live.map((m) => m.seq ?? Infinity));
+    catchUp(matchId, live, Number.isFinite(firstSeq) ? firstSeq - 1 : 0);
+  }
+
+  function joinRoom(matchId: string) {
+    socketRef.current?.emit("joinRoom", { roomId: matchId }, ({ seq, error }: { seq?: number; error?: string }) => {
+      if (error || seq === undefined) {
+        console.error("Failed to join room", error);
+        return;
+      }
+      if (selectedMatchIdRef.current === matchId) catchUp(matchId, [], seq);
+    });
+  }
+
   async function selectMatch(match: Match) {
     setSelectedMatch(match);
+    selectedMatchIdRef.current = match.match_id;
+    lastSeqRef.current = 0;
     setMessages([]);
+    setOlderCursor(null);
 
     try {
-      const res = await fetch(`/api/messages?matchId=${match.match_id}`);
+      // Latest page only; older pages are loaded on demand with loadOlder
+      const res = await apiFetch(`/api/messages?matchId=${match.match_id}`);
+      if (selectedMatchIdRef.current !== match.match_id) return;
       if (res.ok) {
         const history: Msg[] = await res.json();
-        setMessages(history);
+        // Live messages that arrived while the page loaded are kept
+        setMessages((prev) => mergeMessages(history, prev));
+        lastSeqRef.current = Math.max(lastSeqRef.current, ...history.map((m) => m.seq ?? 0));
+        ackSeen(match.match_id);
+        setOlderCursor(
+          history.length >= MESSAGES_PAGE_SIZE ? res.headers.get("X-Before-Cursor") : null
+        );
       } else {
         console.error("Failed to fetch history", await res.text());
       }
@@ -125,7 +256,34 @@ export default function MatchChat() {
       console.error("Error fetching history", e);
     }
 
-    socketRef.current?.emit("joinRoom", match.match_id);
+    joinRoom(match.match_id);
+  }
+
+  async function loadOlder() {
+    const matchId = selectedMatch?.match_id;
+    if (!matchId || !olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+
+    try {
+      const res = await apiFetch(
+        `/api/messages?matchId=${matchId}&before=${encodeURIComponent(olderCursor)}`
+      );
+      // Ignore the page if another match was selected while it loaded
+      if (selectedMatchIdRef.current !== matchId) return;
+      if (res.ok) {
+        const page: Msg[] = await res.json();
+        setMessages((prev) => [...page, ...prev]);
+        setOlderCursor(
+          page.length >= MESSAGES_PAGE_SIZE ? res.headers.get("X-Before-Cursor") : null
+        );
+      } else {
+        console.error("Failed to fetch older messages", await res.text());
+      }
+    } catch (e) {
+      console.error("Error fetching older messages", e);
+    } finally {
+      setLoadingOlder(false);
+    }
   }
 
   const send = () => {
@@ -228,6 +386,17 @@ export default function MatchChat() {
         </div>
 
         <div className="flex-1 p-4 overflow-y-auto flex flex-col">
+          {olderCursor && (
+            <Button
+              variant="ghost"
+              size="sm"
+              className="self-center mb-2 text-gray-500"
+              onClick={loadOlder}
+              disabled={loadingOlder}
+            >
+              {loadingOlder ? "Loading…" : "Load older messages"}
+            </Button>
+          )}
           {messages.map((m, i) => (
             <div
               key={i}
@@ -5,6 +5,7 @@ import { Button } from "@/components/ui/button";
 import { Upload, X } from "lucide-react";
 import Image from "next/image";
 import { useState } from "react";
+import { apiFetch } from "@/lib/api";
 
 interface PersonalInfoProps {
   formData: {
@@ -38,7 +39,7 @@ export function PersonalInfo({ formData, onUpdate }: PersonalInfoProps) {
       formData.append("file", file);
 
       // Upload to our backend endpoint
-      const response = await fetch("/api/upload-image", {
+      const response = await apiFetch("/api/upload-image", {
         method: "POST",
         headers: {
           Authorization: `Bearer ${token}`,
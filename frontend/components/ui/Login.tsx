@@ -13,6 +13,7 @@ import {
   CardTitle,
 } from "@/components/ui/card";
 import { useRouter } from "next/navigation";
+import { tokenClaims } from "@/lib/api";
 
 export default function Login({ showEntrance }: { showEntrance: boolean }) {
   const [isLogin, setIsLogin] = useState(true);
@@ -47,6 +48,9 @@ export default function Login({ showEntrance }: { showEntrance: boolean }) {
       // Store the JWT token in localStorage
       if (data.access_token) {
         localStorage.setItem("access_token", data.access_token);
+        if (data.refresh_token) {
+          localStorage.setItem("refresh_token", data.refresh_token);
+        }
         // localStorage.setItem("user_id", data.user_id || ""); 
         console.log("Token stored successfully:", data.access_token);
 
@@ -88,45 +92,27 @@ export default function Login({ showEntrance }: { showEntrance: boolean }) {
       // Store the JWT token in localStorage
       if (data.access_token) {
         localStorage.setItem("access_token", data.access_token);
+        if (data.refresh_token) {
+          localStorage.setItem("refresh_token", data.refresh_token);
+        }
         console.log("Token stored successfully:", data.access_token);
 
         // Verify token was stored
         const storedToken = localStorage.getItem("access_token");
         console.log("Verified stored token:", storedToken);
 
-        // Check user's onboarding status
-        try {
-          const profileResponse = await fetch("/api/users/me", {
-            method: "GET",
-            headers: {
-              "Content-Type": "application/json",
-              Authorization: `Bearer ${data.access_token}`,
-            },
-          });
-
-          if (profileResponse.ok) {
-            const profileData = await profileResponse.json();
-            console.log("User profile:", profileData);
-            localStorage.setItem("user_id", profileData.id || "");
+        // The access token carries the user id and onboarding status
+        const claims = tokenClaims(data.access_token);
+        localStorage.setItem("user_id", claims.sub || "");
 
-            // Redirect based on onboarding status
-            if (profileData.has_onboarded) {
-              console.log("User has completed onboarding, redirecting to home");
-              router.push("/home");
-            } else {
-              console.log(
-                "User has not completed onboarding, redirecting to onboarding"
-              );
-              router.push("/onboarding");
-            }
-          } else {
-            console.error(
-              "Failed to fetch user profile, defaulting to onboarding"
-            );
-            router.push("/onboarding");
-          }
-        } catch (profileError) {
-          console.error("Error fetching user profile:", profileError);
+        // Redirect based on onboarding status
+        if (claims.onb) {
+          console.log("User has completed onboarding, redirecting to home");
+          router.push("/home");
+        } else {
+          console.log(
+            "User has not completed onboarding, redirecting to onboarding"
+          );
           router.push("/onboarding");
         }
       } else {
@@ -0,0 +1,62 @@
+// fetch for the app's authenticated /api routes. Sends the stored access token
+// and, when the backend answers 401 (expired), trades the refresh token for a
+// new pair once and retries. Refresh tokens are single-use, so concurrent 401s
+// share one refresh.
+let refreshing: Promise<boolean> | null = null;
+
+export function storeTokens(data: { access_token?: string; refresh_token?: string }) {
+  if (data.access_token) localStorage.setItem("access_token", data.access_token);
+  if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token);
+}
+
+// The claims of an access token issued by the backend (sub, and the compact
+// profile claims such as onb). Read without verifying; the backend does that.
+export function tokenClaims(token: string): { sub?: string; onb?: boolean; iv?: string } {
+  try {
+    const payload = token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/");
+    return JSON.parse(atob(payload.padEnd(Math.ceil(payload.length / 4) * 4, "=")));
+  } catch {
+    return {};
+  }
+}
+
+async function refreshTokens(): Promise<boolean> {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return false;
+
+  try {
+    const res = await fetch("/api/auth/refresh", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!res.ok) {
+      // Expired, already used, or revoked by a password change: sign in again
+      localStorage.removeItem("access_token");
+      localStorage.removeItem("refresh_token");
+      return false;
+    }
+    storeTokens(await res.json());
+    return true;
+  } catch (e) {
+    console.error("Token refresh failed", e);
+    return false;
+  }
+}
+
+export async function apiFetch(input: string, init: RequestInit = {}): Promise<Response> {
+  const send = () => {
+    const headers = new Headers(init.headers);
+    const token = localStorage.getItem("access_token");
+    if (token) headers.set("Authorization", `Bearer ${token}`);
+    return fetch(input, { ...init, headers });
+  };
+
+  const response = await send();
+  if (response.status !== 401) return response;
+
+  refreshing ??= refreshTokens().finally(() => {
+    refreshing = null;
+  });
+  return (await refreshing) ? send() : response;
+}
@@ -0,0 +1,8 @@
+// The backend rate-limits anonymous requests by client address. Every request
+// reaches it from this proxy, so pass the X-Forwarded-For chain on: the backend
+// only trusts it from addresses in its TRUSTED_PROXIES. Whatever sits in front
+// of Next (load balancer, `next start` itself) appends the client's address.
+export function forwardedFor(request: Request): Record<string, string> {
+  const chain = request.headers.get("x-forwarded-for");
+  return chain ? { "X-Forwarded-For": chain } : {};
+}
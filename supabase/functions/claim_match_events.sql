@@ -0,0 +1,30 @@
+-- Take up to batch_size queued match events off the outbox, oldest first, with
+-- both users' display fields. Claimed events are deleted, so each is delivered
+-- by one API node only; SKIP LOCKED lets several nodes claim at the same time.
+CREATE OR REPLACE FUNCTION claim_match_events(batch_size integer DEFAULT 100)
+RETURNS TABLE (
+  event_id bigint,
+  match_id uuid,
+  matched_at timestamptz,
+  user1 jsonb,
+  user2 jsonb
+) AS $$
+  with claimed as (
+    delete from match_events e
+    where e.id in (
+      select id from match_events
+      order by id
+      limit batch_size
+      for update skip locked
+    )
+    returning e.id, e.match_id
+  )
+  select c.id, m.match_id, m.matched_at,
+         jsonb_build_object('id', u1.id, 'first_name', u1.first_name, 'last_name', u1.last_name, 'image_url', u1.image_url),
+         jsonb_build_object('id', u2.id, 'first_name', u2.first_name, 'last_name', u2.last_name, 'image_url', u2.image_url)
+  from claimed c
+  join "Matches" m on m.match_id = c.match_id
+  join "User" u1 on u1.id = m.user1_id
+  join "User" u2 on u2.id = m.user2_id
+  order by c.id;
+$$ LANGUAGE sql VOLATILE;
@@ -1,11 +1,17 @@
+-- One branch per side of the match, so each is an index scan on Matches
+-- (user1_id, user2_id) or (user2_id) instead of a scan filtered with OR.
 select u.id, u.first_name, u.last_name, u.bio, u.image_url,
         u.user_domain, u.user_sector, u.skills,
         u.linkedin_url, u.github_url, u.twitter_url
 from "Matches" m
-join "User" u
-    on u.id = case 
-                when m.user1_id = target_user_id then m.user2_id
-                else m.user1_id
-            end
-where (m.user1_id = target_user_id or m.user2_id = target_user_id)
+join "User" u on u.id = m.user2_id
+where m.user1_id = target_user_id
+    and u.has_onboarded = true
+union all
+select u.id, u.first_name, u.last_name, u.bio, u.image_url,
+        u.user_domain, u.user_sector, u.skills,
+        u.linkedin_url, u.github_url, u.twitter_url
+from "Matches" m
+join "User" u on u.id = m.user1_id
+where m.user2_id = target_user_id
     and u.has_onboarded = true;
@@ -0,0 +1,11 @@
+-- Highest sequence number stored for a match (0 if none), used to re-seed the
+-- Redis counter chat:seq:{room} when the key has been lost.
+CREATE OR REPLACE FUNCTION get_max_message_seq(
+  target_match_id uuid
+)
+RETURNS bigint AS $$
+  select coalesce(max(m.seq), 0)
+  from "Messages" m
+  where m.match_id = target_match_id
+    and m.seq IS NOT NULL;
+$$ LANGUAGE sql STABLE;
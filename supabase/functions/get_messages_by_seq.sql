@@ -0,0 +1,27 @@
+-- A match's messages with from_seq <= seq <= to_seq, oldest first, for filling
+-- gaps a client detected in the per-room sequence numbers.
+CREATE OR REPLACE FUNCTION get_messages_by_seq(
+  target_match_id uuid,
+  from_seq bigint,
+  to_seq bigint DEFAULT NULL,
+  page_limit integer DEFAULT 50
+)
+RETURNS TABLE (
+  message_id uuid,
+  sender_id uuid,
+  content text,
+  sent_at_ms bigint,
+  sent_at_us bigint,
+  seq bigint
+) AS $$
+  select m.message_id, m.sender_id, m.content,
+         floor(extract(epoch from m.sent_at) * 1000)::bigint,
+         (extract(epoch from m.sent_at) * 1000000)::bigint,
+         m.seq
+  from "Messages" m
+  where m.match_id = target_match_id
+    and m.seq >= from_seq
+    and (to_seq IS NULL or m.seq <= to_seq)
+  order by m.seq
+  limit page_limit;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,56 @@
+-- One page of a match's chat history, oldest first, with timestamps converted in SQL.
+-- Keyset pagination on (sent_at, message_id); cursors are passed as epoch microseconds + message_id:
+--   after_us/after_id   -> the page_limit messages right after the cursor (newer)
+--   before_us/before_id -> the page_limit messages right before the cursor (older)
+--   neither             -> the latest page_limit messages
+-- The return type gained seq, which CREATE OR REPLACE cannot change in place
+DROP FUNCTION IF EXISTS get_messages_page(uuid, bigint, uuid, bigint, uuid, integer);
+CREATE OR REPLACE FUNCTION get_messages_page(
+  target_match_id uuid,
+  before_us bigint DEFAULT NULL,
+  before_id uuid DEFAULT NULL,
+  after_us bigint DEFAULT NULL,
+  after_id uuid DEFAULT NULL,
+  page_limit integer DEFAULT 50
+)
+RETURNS TABLE (
+  message_id uuid,
+  sender_id uuid,
+  content text,
+  sent_at_ms bigint,
+  sent_at_us bigint,
+  seq bigint
+) AS $$
+#variable_conflict use_column
+BEGIN
+  IF after_us IS NOT NULL THEN
+    RETURN QUERY
+      select m.message_id, m.sender_id, m.content,
+             floor(extract(epoch from m.sent_at) * 1000)::bigint,
+             (extract(epoch from m.sent_at) * 1000000)::bigint,
+             m.seq
+      from "Messages" m
+      where m.match_id = target_match_id
+        and (m.sent_at, m.message_id) > ('epoch'::timestamptz + after_us * interval '1 microsecond',
+                                         coalesce(after_id, '00000000-0000-0000-0000-000000000000'::uuid))
+      order by m.sent_at, m.message_id
+      limit page_limit;
+  ELSE
+    RETURN QUERY
+      select p.* from (
+        select m.message_id, m.sender_id, m.content,
+               floor(extract(epoch from m.sent_at) * 1000)::bigint as sent_at_ms,
+               (extract(epoch from m.sent_at) * 1000000)::bigint as sent_at_us,
+               m.seq
+        from "Messages" m
+        where m.match_id = target_match_id
+          and (before_us IS NULL
+               or (m.sent_at, m.message_id) < ('epoch'::timestamptz + before_us * interval '1 microsecond',
+                                               coalesce(before_id, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::uuid)))
+        order by m.sent_at desc, m.message_id desc
+        limit page_limit
+      ) p
+      order by p.sent_at_us, p.message_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,35 @@
+-- Fallback discovery feed for users without recommendations: onboarded profiles in id order,
+-- paginated by keyset (pass the last id received as after_id). Already-liked users are skipped.
+CREATE OR REPLACE FUNCTION get_onboarded_profiles(
+  target_user_id uuid,
+  after_id uuid DEFAULT NULL,
+  page_size integer DEFAULT 20
+)
+RETURNS TABLE (
+  id uuid,
+  first_name text,
+  last_name text,
+  bio text,
+  image_url text,
+  user_domain public.domains[],
+  user_sector public.sectors[],
+  skills text[],
+  linkedin_url text,
+  github_url text,
+  twitter_url text
+) AS $$
+  select u.id, u.first_name, u.last_name, u.bio, u.image_url,
+         u.user_domain, u.user_sector, u.skills,
+         u.linkedin_url, u.github_url, u.twitter_url
+  from "User" u
+  where u.has_onboarded = true
+    and u.id <> target_user_id
+    and (after_id is null or u.id > after_id)
+    and not exists (
+      select 1 from "Likes" l
+       where l.liker_id = target_user_id
+         and l.likee_id = u.id
+    )
+  order by u.id
+  limit page_size;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,39 @@
+-- Hydrated recommended profiles for target_user_id in ranked order, one page at a time.
+-- Pass the rank of the last row received as after_rank to get the next page.
+-- Users the target has already liked are skipped.
+CREATE OR REPLACE FUNCTION get_recommended_profiles(
+  target_user_id uuid,
+  after_rank integer DEFAULT 0,
+  page_size integer DEFAULT 20
+)
+RETURNS TABLE (
+  rank integer,
+  id uuid,
+  first_name text,
+  last_name text,
+  bio text,
+  image_url text,
+  user_domain public.domains[],
+  user_sector public.sectors[],
+  skills text[],
+  linkedin_url text,
+  github_url text,
+  twitter_url text
+) AS $$
+  select r.rank::integer, u.id, u.first_name, u.last_name, u.bio, u.image_url,
+         u.user_domain, u.user_sector, u.skills,
+         u.linkedin_url, u.github_url, u.twitter_url
+  from recommendations rec
+  cross join lateral unnest(rec.recommended_user_ids) with ordinality as r(user_id, rank)
+  join "User" u on u.id = r.user_id
+  where rec.user_id = target_user_id
+    and r.rank > after_rank
+    and u.has_onboarded = true
+    and not exists (
+      select 1 from "Likes" l
+       where l.liker_id = target_user_id
+         and l.likee_id = u.id
+    )
+  order by r.rank
+  limit page_size;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,89 @@
+-- Record a like and report whether it produced (or already had) a match, in one call.
+-- The insert is idempotent; the insert_match trigger creates the Matches row as before.
+-- A transaction-scoped advisory lock on the user pair serializes the two sides of a
+-- mutual like, so two users liking each other at the same moment still match.
+-- Returns one row; the matched user's display fields are only set when is_match.
+CREATE OR REPLACE FUNCTION like_user(
+  liker uuid,
+  likee uuid,
+  liked_at timestamptz DEFAULT now()
+)
+RETURNS TABLE (
+  likee_id uuid,
+  created boolean,
+  is_match boolean,
+  match_id uuid,
+  first_name text,
+  last_name text,
+  image_url text
+) AS $$
+#variable_conflict use_column
+DECLARE
+  inserted integer;
+  found_match uuid;
+BEGIN
+  IF liker = likee THEN
+    RAISE EXCEPTION 'A user cannot like themselves';
+  END IF;
+
+  PERFORM pg_advisory_xact_lock(
+    hashtextextended(least(liker, likee)::text || greatest(liker, likee)::text, 0)
+  );
+
+  INSERT INTO public."Likes" (liker_id, likee_id, liked_at)
+  VALUES (liker, likee, like_user.liked_at)
+  ON CONFLICT (liker_id, likee_id) DO NOTHING;
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+
+  SELECT m.match_id INTO found_match
+  FROM public."Matches" m
+  WHERE m.user1_id = least(liker, likee)
+    AND m.user2_id = greatest(liker, likee);
+
+  IF found_match IS NULL THEN
+    RETURN QUERY SELECT likee, inserted > 0, false, NULL::uuid, NULL::text, NULL::text, NULL::text;
+  ELSE
+    RETURN QUERY
+      SELECT likee, inserted > 0, true, found_match,
+             u.first_name::text, u.last_name::text, u.image_url::text
+      FROM public."User" u
+      WHERE u.id = likee;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bulk variant for swipe queues flushed by the client, e.g.
+--   select * from like_users('<liker>', '[{"likee_id": "...", "liked_at": "..."}]'::jsonb);
+-- Pairs are processed in lock-key order so concurrent bulk calls cannot deadlock.
+CREATE OR REPLACE FUNCTION like_users(
+  liker uuid,
+  likes jsonb
+)
+RETURNS TABLE (
+  likee_id uuid,
+  created boolean,
+  is_match boolean,
+  match_id uuid,
+  first_name text,
+  last_name text,
+  image_url text
+) AS $$
+DECLARE
+  l record;
+BEGIN
+  FOR l IN
+    SELECT q.likee, q.liked_at
+    FROM (
+      SELECT DISTINCT ON ((e->>'likee_id')::uuid)
+             (e->>'likee_id')::uuid AS likee,
+             coalesce((e->>'liked_at')::timestamptz, now()) AS liked_at
+      FROM jsonb_array_elements(likes) e
+      WHERE (e->>'likee_id')::uuid <> liker
+      ORDER BY (e->>'likee_id')::uuid, (e->>'liked_at')::timestamptz
+    ) q
+    ORDER BY hashtextextended(least(liker, q.likee)::text || greatest(liker, q.likee)::text, 0)
+  LOOP
+    RETURN QUERY SELECT * FROM like_user(liker, l.likee, l.liked_at);
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
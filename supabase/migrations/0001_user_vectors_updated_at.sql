@@ -0,0 +1,17 @@
+-- Track when each embedding last changed so the recommendation refresh can run incrementally (--since)
+ALTER TABLE public.user_vectors
+  ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_user_vectors_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_touch_user_vectors_updated_at ON public.user_vectors;
+CREATE TRIGGER trg_touch_user_vectors_updated_at
+BEFORE UPDATE ON public.user_vectors
+FOR EACH ROW
+EXECUTE FUNCTION touch_user_vectors_updated_at();
@@ -0,0 +1,11 @@
+-- Content fingerprint (hash of the embed text plus model version) stored alongside each embedding,
+-- so profiles are only re-embedded when their text or the model changes
+ALTER TABLE public.user_vectors
+  ADD COLUMN IF NOT EXISTS fingerprint text,
+  ADD COLUMN IF NOT EXISTS model_version text;
+
+-- Embeddings are upserted on user_id
+CREATE UNIQUE INDEX IF NOT EXISTS user_vectors_user_id_key ON public.user_vectors (user_id);
+
+-- Lets jobs/reembed_stale.py find rows from an older model quickly
+CREATE INDEX IF NOT EXISTS user_vectors_model_version_idx ON public.user_vectors (model_version);
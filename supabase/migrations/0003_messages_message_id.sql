@@ -0,0 +1,6 @@
+-- Idempotency key for chat messages: the write-behind flusher may deliver a batch more than once,
+-- and inserts skip rows whose message_id already exists
+ALTER TABLE public."Messages"
+  ADD COLUMN IF NOT EXISTS message_id uuid NOT NULL DEFAULT gen_random_uuid();
+
+CREATE UNIQUE INDEX IF NOT EXISTS messages_message_id_key ON public."Messages" (message_id);
@@ -0,0 +1,9 @@
+-- Per-room sequence number assigned by the chat server (Redis INCR on chat:seq:{room}).
+-- Clients ack by seq and fetch missed ranges with /messages?fromSeq=&toSeq=.
+-- Messages written before this column existed keep seq NULL.
+ALTER TABLE public."Messages"
+  ADD COLUMN IF NOT EXISTS seq bigint;
+
+CREATE UNIQUE INDEX IF NOT EXISTS messages_match_id_seq_key
+  ON public."Messages" (match_id, seq)
+  WHERE seq IS NOT NULL;
@@ -0,0 +1,10 @@
+-- A user can like another user only once; like_user() relies on this for ON CONFLICT DO NOTHING.
+-- Keep the earliest of any existing duplicates before adding the constraint.
+DELETE FROM public."Likes" l
+USING public."Likes" d
+WHERE l.liker_id = d.liker_id
+  AND l.likee_id = d.likee_id
+  AND (l.liked_at, l.like_id::text) > (d.liked_at, d.like_id::text);
+
+CREATE UNIQUE INDEX IF NOT EXISTS likes_liker_id_likee_id_key
+  ON public."Likes" (liker_id, likee_id);
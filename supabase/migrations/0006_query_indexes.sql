@@ -0,0 +1,20 @@
+-- Indexes behind the hot queries. Likes(liker_id, likee_id) is covered by the unique
+-- index from 0005, which also serves the insert_match trigger's reverse-like probe.
+
+-- Approximate nearest neighbours for get_similar_users (order by embedding <=> ...).
+-- Cosine ops to match the <=> operator; HNSW needs no training data, unlike IVFFlat.
+CREATE INDEX IF NOT EXISTS user_vectors_embedding_hnsw_idx
+  ON public.user_vectors USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- insert_match's NOT EXISTS probe and the user1_id branch of get_matched_users
+CREATE INDEX IF NOT EXISTS matches_user1_id_user2_id_idx
+  ON public."Matches" (user1_id, user2_id);
+
+-- The user2_id branch of get_matched_users
+CREATE INDEX IF NOT EXISTS matches_user2_id_idx
+  ON public."Matches" (user2_id);
+
+-- get_messages_page keysets on (sent_at, message_id) within a match
+CREATE INDEX IF NOT EXISTS messages_match_id_sent_at_idx
+  ON public."Messages" (match_id, sent_at, message_id);
@@ -0,0 +1,23 @@
+-- Outbox of new matches. Every Matches insert, whichever path made it (the
+-- insert_match trigger, like_user, or a manual insert), queues an event here in
+-- the same transaction; the API claims events with claim_match_events() and
+-- pushes matchCreated to both users over socket.io.
+CREATE TABLE IF NOT EXISTS public.match_events (
+  id bigserial PRIMARY KEY,
+  match_id uuid NOT NULL REFERENCES public."Matches"(match_id) ON DELETE CASCADE,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION enqueue_match_event()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.match_events(match_id) VALUES (NEW.match_id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_enqueue_match_event ON public."Matches";
+CREATE TRIGGER trg_enqueue_match_event
+AFTER INSERT ON public."Matches"
+FOR EACH ROW
+EXECUTE FUNCTION enqueue_match_event();
@@ -0,0 +1,4 @@
+-- Lets update_reverse_neighbours find every recommendations row that lists a
+-- user (recommended_user_ids @> ARRAY[user]) without scanning the table.
+CREATE INDEX IF NOT EXISTS recommendations_recommended_user_ids_gin
+  ON public.recommendations USING gin (recommended_user_ids);
@@ -0,0 +1,5 @@
+-- Refresh tokens carry the user's token_version (claim "ver") and are only
+-- accepted while it matches. Changing the password bumps it, which revokes
+-- every refresh token issued before.
+ALTER TABLE public."User"
+  ADD COLUMN IF NOT EXISTS token_version integer NOT NULL DEFAULT 0;